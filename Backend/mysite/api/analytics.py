@@ -0,0 +1,223 @@
+from datetime import timedelta
+
+import numpy as np
+from django.core.cache import cache
+from django.db.models import BigIntegerField, F
+from django.db.models.functions import Cast, ExtractHour
+
+from .dashboard_cache import ALL_BRANCHES, bump_version, get_version
+from .models import Invoice, InvoiceItem
+from .rollups import LINE_TOTAL, period_end, period_start
+
+# Monthly facts are invalidated by a version bump; the TTL only frees
+# memory of months nobody looks at any more
+FACTS_TTL = 60 * 60 * 24
+
+# Code of an unset product or category
+NO_CODE = -1
+
+# Invoice.payment_status values, coded by position
+STATUS_CODES = [code for code, _ in Invoice.PAYMENT_STATUS_CHOICES]
+_STATUS_INDEX = {code: index for index, code in enumerate(STATUS_CODES)}
+
+# Axes whose codes are always all present in a pivot
+FIXED_AXES = {"weekday": 7, "hour": 24}
+
+
+def _facts_scope(branch_id, month):
+    return f"facts:{branch_id or ALL_BRANCHES}:{month:%Y-%m}"
+
+
+def bump_fact_months(days):
+    """Invalidate cached facts of the months containing (branch_id, business_date) days."""
+    for branch_id, month in {(branch_id, period_start("MONTH", day)) for branch_id, day in days}:
+        bump_version(_facts_scope(branch_id, month))
+        bump_version(_facts_scope(None, month))
+
+
+def day_number(day):
+    """Days since 1970-01-01, the code of a business date."""
+    return int(np.datetime64(day, "D").astype(np.int64))
+
+
+def day_dates(codes):
+    """Business dates of day codes."""
+    return np.asarray(codes, dtype=np.int64).astype("datetime64[D]").tolist()
+
+
+def _day_columns(dates):
+    days = np.array(dates, dtype="datetime64[D]").astype(np.int32)
+    # 1970-01-01 was a Thursday
+    return days, ((days + 3) % 7).astype(np.int8)
+
+
+def _invoice_columns(rows):
+    dates, hours, statuses, cents = zip(*rows) if rows else ((),) * 4
+    days, weekdays = _day_columns(dates)
+    return {
+        "day": days,
+        "hour": np.array(hours, dtype=np.int8),
+        "weekday": weekdays,
+        "status": np.array([_STATUS_INDEX.get(code, NO_CODE) for code in statuses], dtype=np.int8),
+        "cents": np.array(cents, dtype=np.int64),
+    }
+
+
+def _item_columns(rows):
+    dates, hours, statuses, products, categories, quantities, cents = (
+        zip(*rows) if rows else ((),) * 7
+    )
+    days, weekdays = _day_columns(dates)
+    return {
+        "day": days,
+        "hour": np.array(hours, dtype=np.int8),
+        "weekday": weekdays,
+        "status": np.array([_STATUS_INDEX.get(code, NO_CODE) for code in statuses], dtype=np.int8),
+        "product": np.array([NO_CODE if code is None else code for code in products], dtype=np.int32),
+        "category": np.array([NO_CODE if code is None else code for code in categories], dtype=np.int32),
+        "quantity": np.array(quantities, dtype=np.int32),
+        "cents": np.array(cents, dtype=np.int64),
+    }
+
+
+def load_month(branch_id, month):
+    """Invoice and item columns of one branch (or all branches) and month, from the database."""
+    invoice_filter = {"business_date__gte": month, "business_date__lte": period_end("MONTH", month)}
+    item_filter = dict(invoice_filter)
+    if branch_id:
+        invoice_filter["branch_id"] = branch_id
+        item_filter["invoice__branch_id"] = branch_id
+
+    invoices = list(
+        Invoice.objects.filter(**invoice_filter)
+        .annotate(
+            hour=ExtractHour("created_at"),
+            cents=Cast(F("total_amount") * 100, BigIntegerField()),
+        )
+        .values_list("business_date", "hour", "payment_status", "cents")
+        .order_by()
+    )
+    items = list(
+        InvoiceItem.objects.filter(**item_filter)
+        .annotate(
+            hour=ExtractHour("invoice__created_at"),
+            cents=Cast(LINE_TOTAL * 100, BigIntegerField()),
+        )
+        .values_list(
+            "business_date",
+            "hour",
+            "invoice__payment_status",
+            "product_id",
+            "product__category_id",
+            "quantity",
+            "cents",
+        )
+        .order_by()
+    )
+    return {"invoices": _invoice_columns(invoices), "items": _item_columns(items)}
+
+
+def cached_month(branch_id, month):
+    """
+    Columns of one branch and month from the cache, loading them on a miss.
+    Entries are keyed by the month's data version, bumped by
+    bump_fact_months() once writes to that month are committed.
+    """
+    scope = _facts_scope(branch_id, month)
+    key = f"analytics:{scope}:{get_version(scope)}"
+    facts = cache.get(key)
+    if facts is None:
+        facts = load_month(branch_id, month)
+        cache.set(key, facts, FACTS_TTL)
+    return facts
+
+
+class SalesFacts:
+    """
+    Invoice and item facts of a branch (or all branches) over a date range,
+    as parallel NumPy columns:
+
+    - invoices: day, hour, weekday, status, cents
+    - items: day, hour, weekday, status, product, category, quantity, cents
+
+    day is the business date as days since 1970-01-01, weekday 0 is Monday,
+    status indexes STATUS_CODES, product and category are ids (NO_CODE when
+    unset) and cents are exact int64 amounts.
+    """
+
+    def __init__(self, tables, start_date, end_date):
+        self.tables = tables
+        self.start_date = start_date
+        self.end_date = end_date
+        self.first_day = day_number(start_date)
+        self.last_day = day_number(end_date)
+
+    @classmethod
+    def load(cls, branch_id, start_date, end_date):
+        """Facts of [start_date, end_date], cut out of cached whole months."""
+        months = []
+        month = period_start("MONTH", start_date)
+        while month <= end_date:
+            months.append(cached_month(branch_id, month))
+            month = period_end("MONTH", month) + timedelta(days=1)
+        if not months:
+            months.append({"invoices": _invoice_columns([]), "items": _item_columns([])})
+
+        first, last = day_number(start_date), day_number(end_date)
+        tables = {}
+        for table, columns in months[0].items():
+            merged = {
+                name: np.concatenate([facts[table][name] for facts in months])
+                for name in columns
+            }
+            in_range = (merged["day"] >= first) & (merged["day"] <= last)
+            tables[table] = {name: column[in_range] for name, column in merged.items()}
+        return cls(tables, start_date, end_date)
+
+    def _axis(self, table, name):
+        """(codes, index of each row into codes) of a column."""
+        values = self.tables[table][name]
+        if name in FIXED_AXES:
+            return np.arange(FIXED_AXES[name]), values.astype(np.intp)
+        if name == "day":
+            return (
+                np.arange(self.first_day, self.last_day + 1),
+                (values - self.first_day).astype(np.intp),
+            )
+        return np.unique(values, return_inverse=True)
+
+    def _totals(self, table, index, size, value):
+        if value is None:
+            return np.bincount(index, minlength=size)
+        # float64 sums are exact for totals below 2**53 cents
+        weights = self.tables[table][value]
+        return np.rint(np.bincount(index, weights=weights, minlength=size)).astype(np.int64)
+
+    def group_by(self, table, key, value="cents"):
+        """
+        Per code of `key`: (codes, row counts, totals of `value`).
+        e.g. group_by("items", "category", "quantity")
+        """
+        codes, index = self._axis(table, key)
+        counts = np.bincount(index, minlength=len(codes))
+        return codes, counts, self._totals(table, index, len(codes), value)
+
+    def pivot(self, table, rows, cols, value=None):
+        """
+        Totals of `value` (row counts when None) per (rows, cols) pair of
+        codes. Returns (row_codes, col_codes, matrix); weekday, hour and day
+        axes list every code, empty ones included.
+        e.g. pivot("invoices", "weekday", "hour") for the 7 x 24 heatmap.
+        """
+        row_codes, row_index = self._axis(table, rows)
+        col_codes, col_index = self._axis(table, cols)
+        cells = row_index.astype(np.int64) * len(col_codes) + col_index
+        matrix = self._totals(table, cells, len(row_codes) * len(col_codes), value)
+        return row_codes, col_codes, matrix.reshape(len(row_codes), len(col_codes))
+
+    def percentiles(self, table, value="cents", q=(50, 90, 99)):
+        """Percentiles of a column, zeros when there are no rows."""
+        column = self.tables[table][value]
+        if not len(column):
+            return np.zeros(len(q))
+        return np.percentile(column, q)
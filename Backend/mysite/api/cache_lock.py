@@ -0,0 +1,66 @@
+import time
+import uuid
+
+from django.core.cache import cache, caches
+
+try:
+    from django_redis.cache import RedisCache
+except ImportError:
+    RedisCache = None
+
+POLL_INTERVAL = 0.05
+
+# Deletes KEYS[1] only while it still holds the owner's token ARGV[1]
+_RELEASE_SCRIPT = """
+if redis.call("get", KEYS[1]) == ARGV[1] then
+    return redis.call("del", KEYS[1])
+end
+return 0
+"""
+
+
+def wait_or_lock(result_key, lock_key, lock_ttl, wait):
+    """
+    Wait for the value of `result_key`, or take `lock_key` to produce it.
+
+    Returns (value, None) once the value is cached, (None, token) when the
+    lock was taken (hand the token to release_lock() when done), and
+    (None, None) when `wait` seconds passed with neither.
+    """
+    token = uuid.uuid4().hex
+    deadline = time.monotonic() + wait
+    while True:
+        value = cache.get(result_key)
+        if value is not None:
+            return value, None
+        if cache.add(lock_key, token, lock_ttl):
+            # The previous holder may have stored the value between the two calls
+            value = cache.get(result_key)
+            if value is None:
+                return None, token
+            release_lock(lock_key, token)
+            return value, None
+        if time.monotonic() >= deadline:
+            return None, None
+        time.sleep(POLL_INTERVAL)
+
+
+def release_lock(lock_key, token):
+    """
+    Delete a lock taken by wait_or_lock(), unless it expired meanwhile and
+    now belongs to someone else.
+
+    On Redis the check and the delete run as one atomic script. Other
+    backends, such as the local-memory fallback used without Redis, check
+    and then delete, so there release is best-effort: a lock that expires
+    and is taken over between the two steps is still deleted.
+    """
+    backend = caches["default"]
+    if RedisCache is not None and isinstance(backend, RedisCache):
+        client = backend.client
+        client.get_client(write=True).eval(
+            _RELEASE_SCRIPT, 1, client.make_key(lock_key), client.encode(token)
+        )
+        return
+    if cache.get(lock_key) == token:
+        cache.delete(lock_key)
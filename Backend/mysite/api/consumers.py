@@ -3,7 +3,20 @@ import json
 from channels.generic.websocket import AsyncWebsocketConsumer
 
 
-class KitchenOrdersConsumer(AsyncWebsocketConsumer):
+class InvoiceEventsMixin:
+    """
+    Unpacks the batched "invoice_events" group message (see api.events) into
+    the individual frames clients already understand.
+    """
+
+    async def invoice_events(self, event):
+        for message in event.get("events", []):
+            handler = getattr(self, message.get("type", ""), None)
+            if handler is not None:
+                await handler(message)
+
+
+class KitchenOrdersConsumer(InvoiceEventsMixin, AsyncWebsocketConsumer):
     """
     Broadcast consumer for kitchen screens.
     Listens for invoice creation and status updates.
@@ -23,6 +36,7 @@ class KitchenOrdersConsumer(AsyncWebsocketConsumer):
                 {
                     "type": "invoice_created",
                     "invoice_id": event.get("invoice_id"),
+                    "invoice_ids": event.get("invoice_ids", [event.get("invoice_id")]),
                 }
             )
         )
@@ -39,7 +53,7 @@ class KitchenOrdersConsumer(AsyncWebsocketConsumer):
         )
 
 
-class OrdersConsumer(AsyncWebsocketConsumer):
+class OrdersConsumer(InvoiceEventsMixin, AsyncWebsocketConsumer):
     """
     Broadcast consumer for waiter/counter screens.
     Listens for invoice creation and status updates (e.g. kitchen marks ready).
@@ -59,6 +73,7 @@ class OrdersConsumer(AsyncWebsocketConsumer):
                 {
                     "type": "invoice_created",
                     "invoice_id": event.get("invoice_id"),
+                    "invoice_ids": event.get("invoice_ids", [event.get("invoice_id")]),
                 }
             )
         )
@@ -0,0 +1,217 @@
+import asyncio
+import json
+import logging
+import time
+from collections import namedtuple
+
+from channels.layers import get_channel_layer
+from django.core.cache import cache
+
+from .dashboard_cache import ALL_BRANCHES
+from .db_pool import report_sync_to_async
+from .events import dashboard_group
+from .json_patch import diff
+
+logger = logging.getLogger(__name__)
+
+# Frames waiting per subscriber. A slow client only ever needs the newest
+# snapshot, so older ones are dropped instead of piling up.
+SUBSCRIBER_QUEUE_SIZE = 1
+
+# (branch_id, timeframe, start_date, end_date) -> DashboardBroadcaster
+_broadcasters = {}
+
+# Patch events kept per stream for reconnecting clients; a client that
+# missed more, or was away longer than the TTL, gets a snapshot instead
+EVENT_LOG_SIZE = 50
+EVENT_LOG_TTL = 60 * 10
+
+# One dashboard version, encoded as SSE events with event id `id`: the full
+# snapshot, and the JSON patch from event `prev` (None for the first version)
+DashboardFrame = namedtuple("DashboardFrame", ["id", "prev", "snapshot", "patch"])
+
+
+def _offer(queue, frame):
+    """Put a frame on a bounded queue, dropping the oldest ones if it is full."""
+    while queue.full():
+        queue.get_nowait()
+    queue.put_nowait(frame)
+
+
+class DashboardBroadcaster:
+    """
+    Computes the dashboard of one (branch, timeframe, date range) once per
+    change, encodes it once as a snapshot and as a patch from the previous
+    version, and hands the same DashboardFrame to every stream of this
+    process showing it. Versions are logged in the cache under their SSE
+    event ids, so reconnecting clients can catch up with patches.
+
+    One task listens on the branch's channel-layer group for the whole key.
+    Changes arriving while a computation runs are coalesced into a single
+    recomputation.
+    """
+
+    def __init__(self, key, compute):
+        self.key = key
+        # Coroutine function returning the dashboard as JSON text
+        self.compute = compute
+        self.subscribers = set()
+        self.latest = None
+        self.document = None
+        self.changed = asyncio.Event()
+        self.task = None
+
+    def subscribe(self):
+        queue = asyncio.Queue(maxsize=SUBSCRIBER_QUEUE_SIZE)
+        self.subscribers.add(queue)
+        if self.latest is not None:
+            _offer(queue, self.latest)
+        if self.task is None:
+            self.task = asyncio.ensure_future(self.run())
+        return queue
+
+    def unsubscribe(self, queue):
+        """Drop a subscriber; returns True once nobody is subscribed any more."""
+        self.subscribers.discard(queue)
+        if self.subscribers:
+            return False
+        if self.task is not None:
+            self.task.cancel()
+        return True
+
+    async def run(self):
+        channel_layer = get_channel_layer()
+        group = dashboard_group(self.key[0])
+        channel_name = await channel_layer.new_channel()
+        # Subscribe before the first computation so no change is missed
+        await channel_layer.group_add(group, channel_name)
+        listener = asyncio.ensure_future(self.listen(channel_layer, channel_name))
+        self.changed.set()
+        try:
+            # Continue from the last version logged, so the first computation
+            # already yields a patch for clients resuming from it
+            try:
+                restored = await report_sync_to_async(latest_event)(self.key)
+            except Exception as e:
+                logger.error(f"Failed to restore dashboard {self.key}: {e}")
+                restored = None
+            if restored is not None:
+                self.latest, text = restored
+                self.document = json.loads(text)
+            offered = None
+
+            while True:
+                await self.changed.wait()
+                self.changed.clear()
+                try:
+                    text = await self.compute()
+                    # Cache round trips run on the report pool like the queries
+                    frame = await report_sync_to_async(self.next_frame)(text)
+                except Exception as e:
+                    logger.error(f"Failed to compute dashboard {self.key}: {e}")
+                    continue
+                if frame is None:
+                    if offered is not None or self.latest is None:
+                        continue
+                    # The restored version is still current
+                    frame = self.latest
+                self.latest = offered = frame
+                for queue in self.subscribers:
+                    _offer(queue, frame)
+        finally:
+            listener.cancel()
+            await channel_layer.group_discard(group, channel_name)
+
+    def next_frame(self, text):
+        """Frame of a newly computed dashboard, None when nothing changed."""
+        document = json.loads(text)
+        ops = None
+        if self.latest is not None:
+            ops = diff(self.document, document)
+            if not ops:
+                return None
+        self.document = document
+
+        event_id = next_event_id(self.key)
+        snapshot = f"id: {event_id}\nevent: dashboard_update\ndata: {text}\n\n".encode()
+        patch = None
+        if ops is not None:
+            patch = f"id: {event_id}\nevent: dashboard_patch\ndata: {json.dumps(ops)}\n\n".encode()
+        frame = DashboardFrame(event_id, self.latest and self.latest.id, snapshot, patch)
+        record_event(self.key, frame, text)
+        return frame
+
+    async def listen(self, channel_layer, channel_name):
+        while True:
+            await channel_layer.receive(channel_name)
+            self.changed.set()
+
+
+def _log_key(key):
+    branch_id, timeframe, start_date, end_date = key
+    return f"dashboard:events:{branch_id or ALL_BRANCHES}:{timeframe}:{start_date}:{end_date}"
+
+
+def next_event_id(key):
+    """
+    Next SSE event id of a stream. Like data versions, a missing counter
+    starts from the clock, so ids keep increasing after an eviction.
+    """
+    counter = f"{_log_key(key)}:id"
+    try:
+        return cache.incr(counter)
+    except ValueError:
+        cache.add(counter, time.time_ns() // 1000, timeout=None)
+        return cache.incr(counter)
+
+
+def record_event(key, frame, text):
+    """Append a frame's patch to the stream's event log and keep it as the latest version."""
+    log_key = _log_key(key)
+    # Not atomic across processes: a lost entry only turns a resume into a snapshot
+    events = cache.get(log_key) or []
+    events.append((frame.id, frame.prev, frame.patch))
+    cache.set(log_key, events[-EVENT_LOG_SIZE:], EVENT_LOG_TTL)
+    cache.set(f"{log_key}:latest", (frame, text), EVENT_LOG_TTL)
+
+
+def latest_event(key):
+    """(frame, JSON text) of the newest logged version of a stream, or None."""
+    return cache.get(f"{_log_key(key)}:latest")
+
+
+def missed_events(key, last_id):
+    """
+    (id, patch) events taking a client from event `last_id` to the newest
+    one, or None when they are no longer all in the event log.
+    """
+    events = cache.get(_log_key(key)) or []
+    if not events:
+        return None
+    following = {prev: (event_id, patch) for event_id, prev, patch in events if patch is not None}
+    missed = []
+    while last_id in following:
+        missed.append(following[last_id])
+        last_id = missed[-1][0]
+    if last_id != events[-1][0]:
+        return None
+    return missed
+
+
+def subscribe(key, compute):
+    """Queue of DashboardFrames for `key`, starting with the latest one."""
+    broadcaster = _broadcasters.get(key)
+    if broadcaster is None:
+        broadcaster = _broadcasters[key] = DashboardBroadcaster(key, compute)
+    return broadcaster.subscribe()
+
+
+def unsubscribe(key, queue):
+    broadcaster = _broadcasters.get(key)
+    if broadcaster is not None and broadcaster.unsubscribe(queue):
+        del _broadcasters[key]
+
+
+def broadcaster_count():
+    """Dashboards currently computed for at least one stream of this process."""
+    return len(_broadcasters)
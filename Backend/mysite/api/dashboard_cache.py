@@ -0,0 +1,92 @@
+import time
+
+from django.core.cache import cache
+
+from .cache_lock import release_lock, wait_or_lock
+
+# Safety net only: entries are normally invalidated by a version bump
+REPORT_TTL = 60 * 10
+# Upper bound on one report computation; the lock expires after this
+COMPUTE_LOCK_TTL = 30
+# How long a concurrent miss waits for the computing request before
+# computing the report itself
+COMPUTE_WAIT = 10
+
+ALL_BRANCHES = "all"
+
+
+def _version_key(scope):
+    return f"dashboard:version:{scope}"
+
+
+def get_version(scope):
+    """
+    Current data version of a branch id (or ALL_BRANCHES). A missing counter
+    starts from the clock, so an evicted counter never reuses old versions.
+    """
+    key = _version_key(scope)
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, time.time_ns() // 1000, timeout=None)
+        version = cache.get(key)
+    return version
+
+
+def bump_version(scope):
+    key = _version_key(scope)
+    try:
+        cache.incr(key)
+    except ValueError:
+        # Counter was never read or got evicted
+        cache.add(key, time.time_ns() // 1000, timeout=None)
+
+
+def bump_versions(branch_ids):
+    """Invalidate cached reports of the given branches and of all branches."""
+    for scope in {*branch_ids, ALL_BRANCHES}:
+        bump_version(scope)
+
+
+def _report_key(branch_id, timeframe, start_date, end_date):
+    scope = branch_id or ALL_BRANCHES
+    version = get_version(scope)
+    return f"dashboard:report:{scope}:{version}:{timeframe}:{start_date}:{end_date}"
+
+
+def store_report(branch_id, timeframe, start_date, end_date, compute):
+    """
+    Compute a report with `compute()` and cache it unconditionally, for
+    the precompute worker. The key is taken before computing, so a write
+    landing meanwhile leaves the result under the outdated version.
+    """
+    key = _report_key(branch_id, timeframe, start_date, end_date)
+    report = compute()
+    cache.set(key, report, REPORT_TTL)
+    return report
+
+
+def cached_report(branch_id, timeframe, start_date, end_date, compute):
+    """
+    Return the report for (branch, timeframe, start_date, end_date) from the
+    cache, computing it with `compute()` on a miss.
+
+    Entries are keyed by the branch's data version, so any write to the
+    branch makes them unreachable. Concurrent misses for the same key compute
+    the report once: the others wait for the result, and only compute it
+    themselves if the first one takes longer than COMPUTE_WAIT.
+    """
+    key = _report_key(branch_id, timeframe, start_date, end_date)
+    lock_key = f"{key}:lock"
+
+    report, token = wait_or_lock(key, lock_key, COMPUTE_LOCK_TTL, COMPUTE_WAIT)
+    if report is not None:
+        return report
+    if token is None:
+        return compute()
+
+    try:
+        report = compute()
+        cache.set(key, report, REPORT_TTL)
+        return report
+    finally:
+        release_lock(lock_key, token)
@@ -0,0 +1,90 @@
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import close_old_connections
+
+logger = logging.getLogger(__name__)
+
+# Seconds between two warnings about a saturated pool
+SATURATION_LOG_INTERVAL = 60
+
+
+class DatabasePool(ThreadPoolExecutor):
+    """
+    Bounded thread pool for blocking database work of async code.
+
+    sync_to_async() runs everything on one shared thread by default, where
+    dashboard computations of every stream queue behind each other and
+    behind sync views. This pool keeps them on their own threads instead.
+    Each worker holds its own database connection, so a pool opens at most
+    max_workers connections. Connections past CONN_MAX_AGE, or broken ones,
+    are closed around every call, as the request cycle does.
+    """
+
+    def __init__(self, max_workers, name):
+        super().__init__(max_workers, thread_name_prefix=name)
+        self.name = name
+        self.max_workers = max_workers
+        self._stats_lock = threading.Lock()
+        self.pending = 0
+        self.active = 0
+        self.completed = 0
+        self.peak_queued = 0
+        self.max_wait = 0.0
+        self.warned_at = 0.0
+
+    def submit(self, fn, /, *args, **kwargs):
+        with self._stats_lock:
+            self.pending += 1
+            queued = self.pending - self.active
+            self.peak_queued = max(self.peak_queued, queued)
+            saturated = self.active >= self.max_workers
+        if saturated and time.monotonic() - self.warned_at > SATURATION_LOG_INTERVAL:
+            self.warned_at = time.monotonic()
+            logger.warning(f"{self.name} pool saturated: {self.stats()}")
+        future = super().submit(self._call, time.monotonic(), fn, *args, **kwargs)
+        # Also runs for calls cancelled while still queued
+        future.add_done_callback(self._done)
+        return future
+
+    def _call(self, submitted_at, fn, *args, **kwargs):
+        with self._stats_lock:
+            self.active += 1
+            self.max_wait = max(self.max_wait, time.monotonic() - submitted_at)
+        close_old_connections()
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            close_old_connections()
+            with self._stats_lock:
+                self.active -= 1
+                self.completed += 1
+
+    def _done(self, future):
+        with self._stats_lock:
+            self.pending -= 1
+
+    def stats(self):
+        """Saturation metrics: busy workers, calls waiting for one, and totals so far."""
+        with self._stats_lock:
+            return {
+                "max_workers": self.max_workers,
+                "active": self.active,
+                "queued": self.pending - self.active,
+                "peak_queued": self.peak_queued,
+                "max_wait_ms": round(self.max_wait * 1000, 1),
+                "completed": self.completed,
+            }
+
+
+# SSE and dashboard report queries
+report_pool = DatabasePool(settings.REPORT_DB_WORKERS, "report-db")
+
+
+def report_sync_to_async(func):
+    """sync_to_async() running `func` on the report pool."""
+    return sync_to_async(func, thread_sensitive=False, executor=report_pool)
@@ -0,0 +1,83 @@
+import contextvars
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from django.db import transaction
+
+logger = logging.getLogger(__name__)
+
+# Kitchen screens and waiter/counter screens
+INVOICE_GROUPS = ("kitchen_orders", "orders")
+
+# Events committed during the current request, flushed by InvoiceEventsMiddleware
+_request_events = contextvars.ContextVar("invoice_events", default=None)
+
+# One worker keeps channel layer round trips off the request thread and in order
+_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="invoice-events")
+
+
+def publish_invoice_event(message, groups=INVOICE_GROUPS):
+    """
+    Queue a WebSocket event for the given groups once the surrounding
+    transaction commits. Events from a rolled-back transaction (or savepoint)
+    are never sent. Inside a request, everything committed is sent as one
+    batched group message per group when the response is ready.
+    """
+    transaction.on_commit(lambda: _committed(message, groups))
+
+
+def dashboard_group(branch_id=None):
+    """Channel layer group of the dashboard streams of a branch, or of all branches."""
+    return f"dashboard_{branch_id or 'all'}"
+
+
+def publish_dashboard_changed(branch_ids):
+    """Wake the dashboard streams of the given branches and of all branches."""
+    groups = tuple(sorted({dashboard_group(branch_id) for branch_id in branch_ids}))
+    publish_invoice_event(
+        {"type": "dashboard_changed", "branch_ids": sorted(branch_ids)},
+        groups + (dashboard_group(),),
+    )
+
+
+def _committed(message, groups):
+    pending = _request_events.get()
+    if pending is not None:
+        pending.append((message, groups))
+    else:
+        dispatch([(message, groups)])
+
+
+def dispatch(events):
+    """Send (message, groups) events as one "invoice_events" message per group."""
+    batches = {}
+    for message, groups in events:
+        for group in groups:
+            batches.setdefault(group, []).append(message)
+    if batches:
+        _executor.submit(_send, batches)
+
+
+def _send(batches):
+    try:
+        channel_layer = get_channel_layer()
+        if channel_layer is None:
+            return
+        for group, messages in batches.items():
+            async_to_sync(channel_layer.group_send)(
+                group, {"type": "invoice_events", "events": messages}
+            )
+    except Exception as e:
+        logger.error(f"Failed to publish invoice events: {e}")
+
+
+def start_collecting():
+    return _request_events.set([])
+
+
+def stop_collecting(token):
+    events = _request_events.get() or []
+    _request_events.reset(token)
+    dispatch(events)
@@ -0,0 +1,247 @@
+import csv
+import io
+import zipfile
+from datetime import date, datetime
+from decimal import Decimal
+from xml.sax.saxutils import escape
+
+from asgiref.sync import sync_to_async
+from django.db.models import Exists, OuterRef
+from django.utils import timezone
+
+from .models import Invoice, InvoiceItem, Payment
+
+# Rows fetched per database round trip and written per streamed chunk
+EXPORT_CHUNK_SIZE = 2000
+
+# Leading characters that make spreadsheet apps read a CSV cell as a
+# formula; XLSX cells are written as inline strings, which never are
+FORMULA_PREFIXES = ("=", "+", "-", "@", "\t", "\r")
+
+# (column header, values() lookup) per export, in column order
+EXPORT_COLUMNS = {
+    "invoices": [
+        ("Invoice number", "invoice_number"),
+        ("Business date", "business_date"),
+        ("Created at", "created_at"),
+        ("Branch", "branch__name"),
+        ("Customer", "customer__name"),
+        ("Table", "table_no"),
+        ("Payment status", "payment_status"),
+        ("Invoice status", "invoice_status"),
+        ("Subtotal", "subtotal"),
+        ("Tax", "tax_amount"),
+        ("Discount", "discount"),
+        ("Total", "total_amount"),
+        ("Paid", "paid_amount"),
+        ("Created by", "created_by__username"),
+    ],
+    "items": [
+        ("Invoice number", "invoice__invoice_number"),
+        ("Business date", "business_date"),
+        ("Branch", "invoice__branch__name"),
+        ("Product", "product__name"),
+        ("Category", "product__category__name"),
+        ("Quantity", "quantity"),
+        ("Unit price", "unit_price"),
+        ("Discount", "discount_amount"),
+    ],
+    "payments": [
+        ("Transaction id", "transaction_id"),
+        ("Invoice number", "invoice__invoice_number"),
+        ("Business date", "business_date"),
+        ("Created at", "created_at"),
+        ("Branch", "invoice__branch__name"),
+        ("Payment method", "payment_method"),
+        ("Amount", "amount"),
+        ("Received by", "received_by__username"),
+    ],
+}
+
+EXPORT_MODELS = {"invoices": Invoice, "items": InvoiceItem, "payments": Payment}
+# Lookup from each exported model to its invoice
+INVOICE_PATHS = {"invoices": "", "items": "invoice__", "payments": "invoice__"}
+
+
+def export_queryset(kind, branch_id=None, start_date=None, end_date=None, payment_method=None):
+    """
+    Rows of an export as value tuples, in a stable order. Invoices and items
+    filtered by payment method are those of invoices with such a payment.
+    """
+    invoice_path = INVOICE_PATHS[kind]
+    filters = {}
+    if branch_id:
+        filters[f"{invoice_path}branch_id"] = branch_id
+    if start_date:
+        filters["business_date__gte"] = start_date
+    if end_date:
+        filters["business_date__lte"] = end_date
+
+    queryset = EXPORT_MODELS[kind].objects.filter(**filters)
+    if payment_method:
+        if kind == "payments":
+            queryset = queryset.filter(payment_method=payment_method)
+        else:
+            queryset = queryset.filter(
+                Exists(
+                    Payment.objects.filter(
+                        invoice_id=OuterRef(f"{invoice_path}id" if invoice_path else "id"),
+                        payment_method=payment_method,
+                    )
+                )
+            )
+    lookups = [lookup for _, lookup in EXPORT_COLUMNS[kind]]
+    return queryset.order_by("business_date", "id").values_list(*lookups)
+
+
+def _cell_text(value):
+    if value is None:
+        return ""
+    if isinstance(value, datetime):
+        return timezone.localtime(value).strftime("%Y-%m-%d %H:%M:%S")
+    if isinstance(value, date):
+        return value.isoformat()
+    return str(value)
+
+
+def _csv_cell(value):
+    if isinstance(value, str) and value.startswith(FORMULA_PREFIXES):
+        # Typed text such as a customer name must not run as a formula
+        # when the file is opened in a spreadsheet
+        return f"'{value}"
+    return _cell_text(value)
+
+
+def _chunked(rows):
+    """Lists of up to EXPORT_CHUNK_SIZE rows, fetched with a server-side cursor."""
+    chunk = []
+    for row in rows.iterator(chunk_size=EXPORT_CHUNK_SIZE):
+        chunk.append(row)
+        if len(chunk) == EXPORT_CHUNK_SIZE:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def csv_chunks(kind, rows):
+    """Encoded CSV, one chunk per batch of rows."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    # BOM so Excel reads the file as UTF-8
+    buffer.write("\ufeff")
+    writer.writerow([header for header, _ in EXPORT_COLUMNS[kind]])
+    for chunk in _chunked(rows):
+        writer.writerows([_csv_cell(value) for value in row] for row in chunk)
+        yield buffer.getvalue().encode("utf-8")
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode("utf-8")
+
+
+class _ZipStream(io.RawIOBase):
+    """Write-only, unseekable sink that hands written bytes back to the caller."""
+
+    def __init__(self):
+        self.parts = []
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self.parts.append(bytes(data))
+        return len(data)
+
+    def drain(self):
+        data = b"".join(self.parts)
+        self.parts.clear()
+        return data
+
+
+_XLSX_PARTS = {
+    "[Content_Types].xml": (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+        '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+        '<Default Extension="xml" ContentType="application/xml"/>'
+        '<Override PartName="/xl/workbook.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+        '<Override PartName="/xl/worksheets/sheet1.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+        "</Types>"
+    ),
+    "_rels/.rels": (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" '
+        'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" '
+        'Target="xl/workbook.xml"/>'
+        "</Relationships>"
+    ),
+    "xl/workbook.xml": (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+        'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+        '<sheets><sheet name="{sheet}" sheetId="1" r:id="rId1"/></sheets>'
+        "</workbook>"
+    ),
+    "xl/_rels/workbook.xml.rels": (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" '
+        'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" '
+        'Target="worksheets/sheet1.xml"/>'
+        "</Relationships>"
+    ),
+}
+
+
+def _xlsx_row(values):
+    cells = []
+    for value in values:
+        if isinstance(value, (int, Decimal)) and not isinstance(value, bool):
+            cells.append(f"<c><v>{value}</v></c>")
+        else:
+            cells.append(f'<c t="inlineStr"><is><t>{escape(_cell_text(value))}</t></is></c>')
+    return f"<row>{''.join(cells)}</row>"
+
+
+def xlsx_chunks(kind, rows):
+    """
+    A single-sheet XLSX workbook, zipped as it is written. The worksheet is
+    streamed into the archive with inline strings, so nothing but the
+    current batch of rows is held in memory.
+    """
+    stream = _ZipStream()
+    with zipfile.ZipFile(stream, "w", zipfile.ZIP_DEFLATED) as archive:
+        for name, content in _XLSX_PARTS.items():
+            archive.writestr(name, content.replace("{sheet}", kind.capitalize()))
+        with archive.open("xl/worksheets/sheet1.xml", "w", force_zip64=True) as sheet:
+            sheet.write(
+                (
+                    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+                    '<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">'
+                    "<sheetData>" + _xlsx_row(header for header, _ in EXPORT_COLUMNS[kind])
+                ).encode("utf-8")
+            )
+            for chunk in _chunked(rows):
+                sheet.write("".join(_xlsx_row(row) for row in chunk).encode("utf-8"))
+                yield stream.drain()
+            sheet.write(b"</sheetData></worksheet>")
+    yield stream.drain()
+
+
+async def aiter_chunks(chunks):
+    """
+    Async iterator over a sync chunk generator, for ASGI servers, which
+    would otherwise read a sync streaming response into memory first.
+    Each chunk is produced on the thread-sensitive executor, so the
+    server-side cursor always runs on the same database connection.
+    """
+    done = object()
+    while True:
+        chunk = await sync_to_async(next)(chunks, done)
+        if chunk is done:
+            break
+        yield chunk
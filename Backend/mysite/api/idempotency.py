@@ -0,0 +1,93 @@
+import functools
+import hashlib
+import json
+
+from django.core.cache import cache
+from rest_framework import status
+from rest_framework.response import Response
+
+from .cache_lock import release_lock, wait_or_lock
+
+IDEMPOTENCY_HEADER = "Idempotency-Key"
+# How long a finished response is replayed for a retried key
+RESPONSE_TTL = 60 * 60 * 24
+# Upper bound on one execution; the in-flight marker expires after this
+IN_FLIGHT_TTL = 60
+# Seconds a client should wait before retrying a key that is still in flight
+RETRY_AFTER = 2
+
+
+def _fingerprint(request):
+    body = json.dumps(request.data, sort_keys=True, default=str)
+    return hashlib.sha256(body.encode()).hexdigest()
+
+
+def _replay(stored):
+    response = Response(stored["data"], status=stored["status"])
+    response["Idempotent-Replayed"] = "true"
+    return response
+
+
+def idempotent(view_method):
+    """
+    Make an APIView write method safe to retry with an `Idempotency-Key` header.
+
+    The first successful response for a (user, path, key) is cached and
+    replayed on retries without running the view again. A duplicate that
+    arrives while the first is still running gets a 409 right away, rather
+    than holding a worker thread, and can retry later. Requests without the
+    header are untouched.
+    Only 2xx responses are stored, so a failed attempt can be retried.
+    """
+
+    @functools.wraps(view_method)
+    def wrapper(self, request, *args, **kwargs):
+        key = request.headers.get(IDEMPOTENCY_HEADER)
+        if not key:
+            return view_method(self, request, *args, **kwargs)
+
+        user_id = getattr(request.user, "id", None)
+        base = f"idempotency:{user_id}:{request.path}:{key}"
+        response_key = f"{base}:response"
+        lock_key = f"{base}:lock"
+        fingerprint = _fingerprint(request)
+
+        stored, token = wait_or_lock(response_key, lock_key, IN_FLIGHT_TTL, wait=0)
+        if stored is not None:
+            if stored["fingerprint"] != fingerprint:
+                return Response(
+                    {
+                        "success": False,
+                        "error": "Idempotency-Key was already used with a different request body",
+                    },
+                    status=status.HTTP_422_UNPROCESSABLE_ENTITY,
+                )
+            return _replay(stored)
+        if token is None:
+            response = Response(
+                {
+                    "success": False,
+                    "error": "A request with this Idempotency-Key is still being processed",
+                },
+                status=status.HTTP_409_CONFLICT,
+            )
+            response["Retry-After"] = str(RETRY_AFTER)
+            return response
+
+        try:
+            response = view_method(self, request, *args, **kwargs)
+            if 200 <= response.status_code < 300:
+                cache.set(
+                    response_key,
+                    {
+                        "status": response.status_code,
+                        "data": response.data,
+                        "fingerprint": fingerprint,
+                    },
+                    RESPONSE_TTL,
+                )
+            return response
+        finally:
+            release_lock(lock_key, token)
+
+    return wrapper
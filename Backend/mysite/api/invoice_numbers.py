@@ -0,0 +1,56 @@
+from django.db import transaction
+from django.utils import timezone
+
+from .models import Invoice, InvoiceSequence
+
+
+def invoice_number_prefix(branch_id, business_date):
+    return f"{int(branch_id):02d}-{business_date.strftime('%Y-%m-%d')}"
+
+
+def format_invoice_number(branch_id, business_date, seq):
+    return f"{invoice_number_prefix(branch_id, business_date)}-{seq:02d}"
+
+
+def _last_issued_number(branch_id, business_date):
+    """
+    Highest sequence already used for the day, for seeding a new counter row
+    (invoices created before the counter existed). Compared numerically since
+    "-100" sorts before "-99" as a string.
+    """
+    prefix = invoice_number_prefix(branch_id, business_date)
+    last = 0
+    for number in Invoice.objects.filter(
+        branch_id=branch_id, invoice_number__startswith=prefix
+    ).values_list("invoice_number", flat=True):
+        try:
+            last = max(last, int(number.split("-")[-1]))
+        except ValueError:
+            continue
+    return last
+
+
+@transaction.atomic
+def allocate_invoice_numbers(branch_id, count=1, business_date=None):
+    """
+    Reserve `count` consecutive invoice numbers for a branch's business day.
+
+    The (branch, business_date) counter row is locked and bumped once, so
+    allocation is O(1) and concurrent tills never get the same number. The
+    row stays locked until the caller's transaction ends; a rolled-back
+    invoice therefore also rolls back its number and leaves no gap.
+    """
+    business_date = business_date or timezone.localdate()
+    sequence, _ = InvoiceSequence.objects.select_for_update().get_or_create(
+        branch_id=branch_id,
+        business_date=business_date,
+        # Callable, so the seeding scan only runs when the row is created
+        defaults={"last_number": lambda: _last_issued_number(branch_id, business_date)},
+    )
+    first = sequence.last_number + 1
+    sequence.last_number += count
+    sequence.save(update_fields=["last_number"])
+    return [
+        format_invoice_number(branch_id, business_date, seq)
+        for seq in range(first, first + count)
+    ]
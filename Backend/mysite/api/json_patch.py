@@ -0,0 +1,38 @@
+def _pointer(path, key):
+    """Extend a JSON pointer (RFC 6901) with one reference token."""
+    return f"{path}/{str(key).replace('~', '~0').replace('/', '~1')}"
+
+
+def diff(old, new, path=""):
+    """
+    RFC 6902 operations turning the JSON document `old` into `new`.
+
+    Objects are compared key by key and lists of the same length item by
+    item. A list whose length changed is replaced as a whole, which keeps
+    the operations simple to apply.
+    """
+    if type(old) is not type(new):
+        return [{"op": "replace", "path": path, "value": new}]
+
+    if isinstance(old, dict):
+        ops = [
+            {"op": "remove", "path": _pointer(path, key)}
+            for key in old
+            if key not in new
+        ]
+        for key, value in new.items():
+            if key in old:
+                ops.extend(diff(old[key], value, _pointer(path, key)))
+            else:
+                ops.append({"op": "add", "path": _pointer(path, key), "value": value})
+        return ops
+
+    if isinstance(old, list) and len(old) == len(new):
+        ops = []
+        for index, (old_item, new_item) in enumerate(zip(old, new)):
+            ops.extend(diff(old_item, new_item, _pointer(path, index)))
+        return ops
+
+    if old == new:
+        return []
+    return [{"op": "replace", "path": path, "value": new}]
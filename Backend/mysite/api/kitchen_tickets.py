@@ -0,0 +1,73 @@
+from .models import InvoiceItem, KitchenTicket, Product
+
+
+def build_kitchen_tickets(lines):
+    """
+    Split invoices into one unsaved KitchenTicket per kitchen type.
+
+    `lines` is a list of (invoice, items_data) pairs where each item has a
+    `product` instance and a `quantity`. Product kitchen types are looked up
+    in one query for all lines.
+    """
+    product_ids = {
+        item_data["product"].id
+        for _, items_data in lines
+        for item_data in items_data
+        if item_data.get("product")
+    }
+    kitchen_of = dict(
+        Product.objects.filter(id__in=product_ids).values_list(
+            "id", "category__kitchentype_id"
+        )
+    )
+
+    tickets = []
+    for invoice, items_data in lines:
+        by_kitchen = {}
+        for item_data in items_data:
+            product = item_data.get("product")
+            kitchentype_id = kitchen_of.get(product.id) if product else None
+            if kitchentype_id is None:
+                continue
+            by_kitchen.setdefault(kitchentype_id, []).append(
+                {
+                    "product": product.id,
+                    "name": product.name,
+                    "quantity": item_data["quantity"],
+                }
+            )
+        for kitchentype_id, items in by_kitchen.items():
+            tickets.append(
+                KitchenTicket(
+                    invoice=invoice,
+                    branch_id=invoice.branch_id,
+                    kitchentype_id=kitchentype_id,
+                    invoice_number=invoice.invoice_number,
+                    table_no=invoice.table_no,
+                    floor_name=invoice.floor.name if invoice.floor else "",
+                    description=invoice.description,
+                    status=invoice.invoice_status,
+                    items=items,
+                    created_at=invoice.created_at,
+                )
+            )
+    return tickets
+
+
+def create_kitchen_tickets(lines):
+    KitchenTicket.objects.bulk_create(build_kitchen_tickets(lines))
+
+
+def rebuild_kitchen_tickets(invoices):
+    """Replace the tickets of saved invoices from their current items."""
+    invoices = list(invoices)
+    items_of = {invoice.id: [] for invoice in invoices}
+    items = InvoiceItem.objects.filter(invoice__in=invoices).select_related("product")
+    for item in items:
+        items_of[item.invoice_id].append(
+            {"product": item.product, "quantity": item.quantity}
+        )
+
+    lines = [(invoice, items_of[invoice.id]) for invoice in invoices]
+    KitchenTicket.objects.filter(invoice__in=invoices).delete()
+    create_kitchen_tickets(lines)
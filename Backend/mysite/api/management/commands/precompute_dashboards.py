@@ -0,0 +1,94 @@
+import logging
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+from django.utils import timezone
+
+from ...dashboard_cache import ALL_BRANCHES, REPORT_TTL, get_version, store_report
+from ...models import Branch
+from ...views_dir.dashboard_view import (
+    STANDARD_TIMEFRAMES,
+    build_report_dashboard,
+    timeframe_range,
+)
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = (
+        "Keep the standard dashboard reports (today, this week, this month and "
+        "this year, per branch and for all branches) precomputed in the cache. "
+        "A scope is recomputed as soon as its data version changes, when the "
+        "day rolls over, and every --refresh seconds so entries never expire. "
+        "Custom date ranges are still computed on demand. Needs a cache shared "
+        "with the web processes (Redis)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--interval",
+            type=float,
+            default=1.0,
+            help="Seconds between data version checks",
+        )
+        parser.add_argument(
+            "--refresh",
+            type=float,
+            default=REPORT_TTL / 2,
+            help="Recompute unchanged scopes after this many seconds",
+        )
+        parser.add_argument(
+            "--once",
+            action="store_true",
+            help="Precompute every scope once and exit",
+        )
+
+    def handle(self, *args, **options):
+        # scope -> ((data version, business day), monotonic time computed)
+        computed = {}
+        while True:
+            close_old_connections()
+            try:
+                self.precompute_changed(computed, options["refresh"])
+            except Exception as e:
+                logger.error(f"Dashboard precompute failed: {e}")
+            if options["once"]:
+                break
+            time.sleep(options["interval"])
+
+    def precompute_changed(self, computed, refresh):
+        today = timezone.localdate()
+        for scope in [ALL_BRANCHES, *Branch.objects.values_list("id", flat=True)]:
+            state = (get_version(scope), today)
+            previous = computed.get(scope)
+            if (
+                previous is not None
+                and previous[0] == state
+                and time.monotonic() - previous[1] < refresh
+            ):
+                continue
+
+            started = time.monotonic()
+            try:
+                self.precompute(scope, today)
+            except Exception as e:
+                logger.error(f"Failed to precompute dashboards for {scope}: {e}")
+                continue
+            computed[scope] = (state, started)
+            logger.debug(
+                f"Precomputed dashboards for {scope} in {(time.monotonic() - started) * 1000:.0f} ms"
+            )
+
+    def precompute(self, scope, today):
+        branch_id = None if scope == ALL_BRANCHES else scope
+        for timeframe in STANDARD_TIMEFRAMES:
+            start_date, end_date, timeframe = timeframe_range(timeframe, today)
+            store_report(
+                branch_id,
+                timeframe,
+                start_date,
+                end_date,
+                lambda: build_report_dashboard(branch_id, start_date, end_date, timeframe),
+            )
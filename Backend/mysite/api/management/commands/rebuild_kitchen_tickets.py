@@ -0,0 +1,40 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+from ...kitchen_tickets import rebuild_kitchen_tickets
+from ...models import Invoice
+
+
+class Command(BaseCommand):
+    help = "Rebuild kitchen tickets from the items of recent invoices."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--days", type=int, default=1, help="Rebuild invoices created in the last N days"
+        )
+        parser.add_argument("--chunk-size", type=int, default=500)
+
+    def handle(self, *args, **options):
+        since = timezone.now() - timedelta(days=options["days"])
+        chunk_size = options["chunk_size"]
+        invoices = (
+            Invoice.objects.filter(created_at__gte=since)
+            .select_related("floor")
+            .order_by("id")
+        )
+
+        rebuilt = 0
+        last_id = 0
+        while True:
+            chunk = list(invoices.filter(id__gt=last_id)[:chunk_size])
+            if not chunk:
+                break
+            with transaction.atomic():
+                rebuild_kitchen_tickets(chunk)
+            rebuilt += len(chunk)
+            last_id = chunk[-1].id
+
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt kitchen tickets for {rebuilt} invoices"))
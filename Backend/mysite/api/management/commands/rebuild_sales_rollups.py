@@ -0,0 +1,108 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from ...models import (
+    Invoice,
+    SalesHourRollup,
+    SalesPaymentRollup,
+    SalesProductRollup,
+    SalesStatusRollup,
+)
+from ...rollups import aggregate_day, aggregate_period, period_start, refresh_sales_rollups
+
+# In the order returned by aggregate_day(); aggregate_period() skips the hours
+ROLLUP_FIELDS = {
+    SalesHourRollup: ("hour", "payment_status", "invoice_count", "total_amount"),
+    SalesStatusRollup: ("payment_status", "invoice_count", "total_amount"),
+    SalesProductRollup: ("product_id", "quantity", "total_amount"),
+    SalesPaymentRollup: ("payment_method", "payment_count", "amount"),
+}
+
+
+class Command(BaseCommand):
+    help = (
+        "Rebuild the sales rollup tables from raw invoices, items and payments, "
+        "or check them against raw data with --verify. Weeks and months "
+        "containing the days are rebuilt or checked as well."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--days",
+            type=int,
+            default=None,
+            help="Only business days within the last N days (default: all)",
+        )
+        parser.add_argument("--branch", type=int, default=None)
+        parser.add_argument(
+            "--verify",
+            action="store_true",
+            help="Compare the stored rollups with raw data instead of rebuilding",
+        )
+
+    def handle(self, *args, **options):
+        days = self.business_days(options["days"], options["branch"])
+
+        if not options["verify"]:
+            failed = refresh_sales_rollups(days)
+            if failed:
+                listed = ", ".join(f"branch {branch_id} {day}" for branch_id, day in sorted(failed))
+                raise CommandError(f"Could not rebuild the sales rollups of {len(failed)} branch days: {listed}")
+            self.stdout.write(self.style.SUCCESS(f"Rebuilt sales rollups for {len(days)} branch days"))
+            return
+
+        mismatched = 0
+        for branch_id, day in sorted(days):
+            mismatched += self.compare(branch_id, "DAY", day, aggregate_day(branch_id, day))
+        periods = {
+            (branch_id, period, period_start(period, day))
+            for branch_id, day in days
+            for period in ("WEEK", "MONTH")
+        }
+        for branch_id, period, start in sorted(periods):
+            mismatched += self.compare(
+                branch_id, period, start, (None, *aggregate_period(branch_id, period, start))
+            )
+
+        if mismatched:
+            raise CommandError(f"{mismatched} rollups differ from raw data, run without --verify to rebuild")
+        self.stdout.write(self.style.SUCCESS(f"Sales rollups match raw data for {len(days)} branch days"))
+
+    def compare(self, branch_id, period, start, computed):
+        """Number of rollup tables whose stored rows differ from `computed`."""
+        mismatched = 0
+        for model, expected in zip(ROLLUP_FIELDS, computed):
+            if expected is None:
+                continue
+            fields = ROLLUP_FIELDS[model]
+            stored = model.objects.filter(branch_id=branch_id, business_date=start)
+            if model is not SalesHourRollup:
+                stored = stored.filter(period=period)
+            stored = set(stored.values_list(*fields))
+            raw = {tuple(getattr(row, field) for field in fields) for row in expected}
+            if stored != raw:
+                mismatched += 1
+                self.stdout.write(
+                    self.style.ERROR(
+                        f"{model.__name__} {period} branch {branch_id} {start}: {len(stored ^ raw)} rows differ"
+                    )
+                )
+        return mismatched
+
+    def business_days(self, last_days, branch_id):
+        """(branch_id, business_date) pairs that have invoices or rollup rows."""
+        invoices = Invoice.objects.all()
+        rollups = SalesStatusRollup.objects.all()
+        if last_days is not None:
+            since = timezone.localdate() - timedelta(days=last_days)
+            invoices = invoices.filter(business_date__gte=since)
+            rollups = rollups.filter(business_date__gte=since)
+        if branch_id is not None:
+            invoices = invoices.filter(branch_id=branch_id)
+            rollups = rollups.filter(branch_id=branch_id)
+
+        days = set(invoices.values_list("branch_id", "business_date").distinct())
+        days.update(rollups.values_list("branch_id", "business_date").distinct())
+        return days
@@ -1,4 +1,73 @@
 # api/middleware.py
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+
+from . import rollups
+from .events import start_collecting, stop_collecting
+
+
+class InvoiceEventsMiddleware:
+    """
+    Collects the invoice WebSocket events committed while handling a request
+    and publishes them together once the response is ready.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        token = start_collecting()
+        try:
+            return self.get_response(request)
+        finally:
+            stop_collecting(token)
+
+    async def __acall__(self, request):
+        token = start_collecting()
+        try:
+            return await self.get_response(request)
+        finally:
+            stop_collecting(token)
+
+
+class SalesRollupsMiddleware:
+    """
+    Collects the sales rollup days touched while handling a request and
+    hands them to the background refresh worker once the response is
+    ready, so the refresh never delays the response.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        token = rollups.start_collecting()
+        try:
+            return self.get_response(request)
+        finally:
+            rollups.schedule_refresh(rollups.stop_collecting(token))
+
+    async def __acall__(self, request):
+        token = rollups.start_collecting()
+        try:
+            return await self.get_response(request)
+        finally:
+            rollups.schedule_refresh(rollups.stop_collecting(token))
+
+
 class RateLimitHeadersMiddleware:
     def __init__(self, get_response):
         self.get_response = get_response
@@ -0,0 +1,26 @@
+# Generated by Django 6.0.2 on 2026-10-16 22:34
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0076_alter_invoice_payment_status_notification'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='InvoiceSequence',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('business_date', models.DateField()),
+                ('last_number', models.PositiveIntegerField(default=0)),
+                ('branch', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='invoice_sequences', to='api.branch')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('branch', 'business_date'), name='unique_invoice_sequence_per_branch_day')],
+            },
+        ),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 6.0.2 on 2026-10-16 22:43
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0077_invoicesequence'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='InvoiceTombstone',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('invoice_id', models.BigIntegerField()),
+                ('deleted_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('branch', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='invoice_tombstones', to='api.branch')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['branch', 'deleted_at'], name='api_invoice_branch__7c7a10_idx'), models.Index(fields=['deleted_at'], name='api_invoice_deleted_5f5bd9_idx')],
+            },
+        ),
+    ]
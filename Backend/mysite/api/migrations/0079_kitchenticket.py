@@ -0,0 +1,35 @@
+# Generated by Django 6.0.2 on 2026-10-16 22:44
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0078_invoicetombstone'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='KitchenTicket',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('invoice_number', models.CharField(blank=True, max_length=50)),
+                ('table_no', models.IntegerField(default=1)),
+                ('floor_name', models.CharField(blank=True, max_length=25)),
+                ('description', models.TextField(blank=True, null=True)),
+                ('status', models.CharField(choices=[('PENDING', 'Pending'), ('READY', 'Ready'), ('COMPLETED', 'Completed'), ('CANCELLED', 'Cancelled')], default='PENDING', max_length=10)),
+                ('items', models.JSONField(default=list)),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('branch', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='kitchen_tickets', to='api.branch')),
+                ('invoice', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='kitchen_tickets', to='api.invoice')),
+                ('kitchentype', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='kitchen_tickets', to='api.kitchentype')),
+            ],
+            options={
+                'ordering': ['created_at'],
+                'indexes': [models.Index(fields=['branch', 'kitchentype', 'status', 'created_at'], name='api_kitchen_branch__5c54b6_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,60 @@
+# Generated by Django 6.0.2 on 2026-10-16 22:49
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0079_kitchenticket'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SalesHourRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('business_date', models.DateField()),
+                ('hour', models.PositiveSmallIntegerField()),
+                ('payment_status', models.CharField(choices=[('PENDING', 'Pending'), ('UNPAID', 'Unpaid'), ('PARTIAL', 'Partially Paid'), ('PAID', 'Fully Paid'), ('CANCELLED', 'Cancelled')], max_length=15)),
+                ('invoice_count', models.PositiveIntegerField(default=0)),
+                ('total_amount', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('branch', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='sales_hour_rollups', to='api.branch')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['business_date'], name='api_salesho_busines_b5b64c_idx')],
+                'constraints': [models.UniqueConstraint(fields=('branch', 'business_date', 'hour', 'payment_status'), name='unique_sales_hour_rollup')],
+            },
+        ),
+        migrations.CreateModel(
+            name='SalesPaymentRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('business_date', models.DateField()),
+                ('payment_method', models.CharField(max_length=20)),
+                ('payment_count', models.PositiveIntegerField(default=0)),
+                ('amount', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('branch', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='sales_payment_rollups', to='api.branch')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['business_date'], name='api_salespa_busines_fdbbcb_idx')],
+                'constraints': [models.UniqueConstraint(fields=('branch', 'business_date', 'payment_method'), name='unique_sales_payment_rollup')],
+            },
+        ),
+        migrations.CreateModel(
+            name='SalesProductRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('business_date', models.DateField()),
+                ('quantity', models.PositiveIntegerField(default=0)),
+                ('total_amount', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('branch', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='sales_product_rollups', to='api.branch')),
+                ('product', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='sales_rollups', to='api.product')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['business_date'], name='api_salespr_busines_e5ce47_idx')],
+                'constraints': [models.UniqueConstraint(fields=('branch', 'business_date', 'product'), name='unique_sales_product_rollup')],
+            },
+        ),
+    ]
@@ -0,0 +1,78 @@
+# Generated by Django 5.2.18 on 2026-10-16 23:05
+
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+
+def backfill_business_dates(apps, schema_editor):
+    Invoice = apps.get_model("api", "Invoice")
+    InvoiceItem = apps.get_model("api", "InvoiceItem")
+    Payment = apps.get_model("api", "Payment")
+
+    local_day = TruncDate("created_at", tzinfo=timezone.get_default_timezone())
+    Invoice.objects.update(business_date=local_day)
+    Payment.objects.update(business_date=local_day)
+    InvoiceItem.objects.update(
+        business_date=Subquery(
+            Invoice.objects.filter(id=OuterRef("invoice_id")).values("business_date")[:1]
+        )
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0080_sales_rollups'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='invoice',
+            name='business_date',
+            field=models.DateField(editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='invoiceitem',
+            name='business_date',
+            field=models.DateField(editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='payment',
+            name='business_date',
+            field=models.DateField(editable=False, null=True),
+        ),
+        migrations.RunPython(backfill_business_dates, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='invoice',
+            name='business_date',
+            field=models.DateField(editable=False),
+        ),
+        migrations.AlterField(
+            model_name='invoiceitem',
+            name='business_date',
+            field=models.DateField(editable=False),
+        ),
+        migrations.AlterField(
+            model_name='payment',
+            name='business_date',
+            field=models.DateField(editable=False),
+        ),
+        migrations.AddIndex(
+            model_name='invoice',
+            index=models.Index(fields=['branch', 'business_date'], name='api_invoice_branch__971cce_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='invoice',
+            index=models.Index(fields=['business_date'], name='api_invoice_busines_fb89ca_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='invoiceitem',
+            index=models.Index(fields=['business_date'], name='api_invoice_busines_0149a5_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='payment',
+            index=models.Index(fields=['business_date'], name='api_payment_busines_ad47a4_idx'),
+        ),
+    ]
@@ -0,0 +1,116 @@
+# Generated by Django 6.0.2 on 2026-10-16 23:07
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Sum
+from django.db.models.functions import TruncMonth, TruncWeek
+
+
+def build_rollup_tiers(apps, schema_editor):
+    """Derive DAY status rows from the hourly rollups, then WEEK and MONTH rows."""
+    SalesHourRollup = apps.get_model("api", "SalesHourRollup")
+    SalesStatusRollup = apps.get_model("api", "SalesStatusRollup")
+    SalesProductRollup = apps.get_model("api", "SalesProductRollup")
+    SalesPaymentRollup = apps.get_model("api", "SalesPaymentRollup")
+
+    SalesStatusRollup.objects.bulk_create(
+        SalesStatusRollup(period="DAY", **row)
+        for row in SalesHourRollup.objects.values("branch_id", "business_date", "payment_status")
+        .annotate(invoice_count=Sum("invoice_count"), total_amount=Sum("total_amount"))
+        .order_by()
+    )
+
+    tiers = (
+        (SalesStatusRollup, "payment_status", {"invoice_count": Sum("invoice_count"), "total_amount": Sum("total_amount")}),
+        (SalesProductRollup, "product_id", {"quantity": Sum("quantity"), "total_amount": Sum("total_amount")}),
+        (SalesPaymentRollup, "payment_method", {"payment_count": Sum("payment_count"), "amount": Sum("amount")}),
+    )
+    for model, dimension, sums in tiers:
+        for period, trunc in (("WEEK", TruncWeek), ("MONTH", TruncMonth)):
+            rows = (
+                model.objects.filter(period="DAY")
+                .annotate(start=trunc("business_date"))
+                .values("branch_id", "start", dimension)
+                .annotate(**sums)
+                .order_by()
+            )
+            model.objects.bulk_create(
+                model(period=period, business_date=row.pop("start"), **row) for row in rows
+            )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0081_business_date'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SalesStatusRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('period', models.CharField(choices=[('DAY', 'Day'), ('WEEK', 'Week'), ('MONTH', 'Month')], default='DAY', max_length=5)),
+                ('business_date', models.DateField()),
+                ('payment_status', models.CharField(choices=[('PENDING', 'Pending'), ('UNPAID', 'Unpaid'), ('PARTIAL', 'Partially Paid'), ('PAID', 'Fully Paid'), ('CANCELLED', 'Cancelled')], max_length=15)),
+                ('invoice_count', models.PositiveIntegerField(default=0)),
+                ('total_amount', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+            ],
+        ),
+        migrations.RemoveConstraint(
+            model_name='salespaymentrollup',
+            name='unique_sales_payment_rollup',
+        ),
+        migrations.RemoveConstraint(
+            model_name='salesproductrollup',
+            name='unique_sales_product_rollup',
+        ),
+        migrations.RemoveIndex(
+            model_name='salespaymentrollup',
+            name='api_salespa_busines_fdbbcb_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='salesproductrollup',
+            name='api_salespr_busines_e5ce47_idx',
+        ),
+        migrations.AddField(
+            model_name='salespaymentrollup',
+            name='period',
+            field=models.CharField(choices=[('DAY', 'Day'), ('WEEK', 'Week'), ('MONTH', 'Month')], default='DAY', max_length=5),
+        ),
+        migrations.AddField(
+            model_name='salesproductrollup',
+            name='period',
+            field=models.CharField(choices=[('DAY', 'Day'), ('WEEK', 'Week'), ('MONTH', 'Month')], default='DAY', max_length=5),
+        ),
+        migrations.AddIndex(
+            model_name='salespaymentrollup',
+            index=models.Index(fields=['period', 'business_date'], name='api_salespa_period_fab0a8_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='salesproductrollup',
+            index=models.Index(fields=['period', 'business_date'], name='api_salespr_period_d5e745_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='salespaymentrollup',
+            constraint=models.UniqueConstraint(fields=('branch', 'period', 'business_date', 'payment_method'), name='unique_sales_payment_rollup'),
+        ),
+        migrations.AddConstraint(
+            model_name='salesproductrollup',
+            constraint=models.UniqueConstraint(fields=('branch', 'period', 'business_date', 'product'), name='unique_sales_product_rollup'),
+        ),
+        migrations.AddField(
+            model_name='salesstatusrollup',
+            name='branch',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='sales_status_rollups', to='api.branch'),
+        ),
+        migrations.AddIndex(
+            model_name='salesstatusrollup',
+            index=models.Index(fields=['period', 'business_date'], name='api_salesst_period_3de836_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='salesstatusrollup',
+            constraint=models.UniqueConstraint(fields=('branch', 'period', 'business_date', 'payment_status'), name='unique_sales_status_rollup'),
+        ),
+        migrations.RunPython(build_rollup_tiers, migrations.RunPython.noop),
+    ]
@@ -7,6 +7,21 @@ from django.db.models.base import CASCADE
 from django.utils import timezone
 
 
+def local_date(value):
+    """Calendar day of an aware datetime in the configured TIME_ZONE."""
+    return timezone.localdate(value)
+
+
+class BusinessDateQuerySet(models.QuerySet):
+    """Fills `business_date` on bulk inserts, which bypass Model.save()."""
+
+    def bulk_create(self, objs, *args, **kwargs):
+        objs = list(objs)
+        for obj in objs:
+            obj.fill_business_date()
+        return super().bulk_create(objs, *args, **kwargs)
+
+
 class Branch(models.Model):
     name = models.CharField(max_length=20, unique=True, null=True, blank=True)
     location = models.CharField(max_length=20)
@@ -170,6 +185,8 @@ class Invoice(models.Model):
         max_length=10, choices=INVOICE_TYPE_CHOICES, default="SALE"
     )
     created_at = models.DateTimeField(default=timezone.now)
+    # Local day of created_at, stored so date filters can use an index
+    business_date = models.DateField(editable=False)
     updated_at = models.DateTimeField(auto_now=True)
     created_by = models.ForeignKey(
         User, on_delete=models.SET_NULL, null=True, related_name="created_invoices"
@@ -209,6 +226,8 @@ class Invoice(models.Model):
 
     is_active = models.BooleanField(default=True)
 
+    objects = BusinessDateQuerySet.as_manager()
+
     class Meta:
         ordering = ["-created_at"]
         indexes = [
@@ -216,17 +235,67 @@ class Invoice(models.Model):
             models.Index(fields=["created_at"]),
             models.Index(fields=["payment_status"]),
             models.Index(fields=["branch", "created_at"]),
+            models.Index(fields=["branch", "business_date"]),
+            models.Index(fields=["business_date"]),
         ]
 
     def __str__(self):
         return f"Invoice {self.invoice_number}"
 
+    def fill_business_date(self):
+        if self.business_date is None:
+            self.business_date = local_date(self.created_at)
+
+    def save(self, *args, **kwargs):
+        self.fill_business_date()
+        super().save(*args, **kwargs)
+
     @property
     def due_amount(self):
         """Calculate due amount dynamically"""
         return Decimal(str(self.total_amount)) - Decimal(str(self.paid_amount))
 
 
+class InvoiceTombstone(models.Model):
+    """Record of a deleted invoice, so delta sync clients can drop it."""
+
+    invoice_id = models.BigIntegerField()
+    branch = models.ForeignKey(
+        Branch, on_delete=models.CASCADE, related_name="invoice_tombstones"
+    )
+    deleted_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["branch", "deleted_at"]),
+            models.Index(fields=["deleted_at"]),
+        ]
+
+    def __str__(self):
+        return f"Deleted invoice {self.invoice_id}"
+
+
+class InvoiceSequence(models.Model):
+    """Last invoice number handed out per branch and business day."""
+
+    branch = models.ForeignKey(
+        Branch, on_delete=models.CASCADE, related_name="invoice_sequences"
+    )
+    business_date = models.DateField()
+    last_number = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["branch", "business_date"],
+                name="unique_invoice_sequence_per_branch_day",
+            )
+        ]
+
+    def __str__(self):
+        return f"{self.branch_id} {self.business_date}: {self.last_number}"
+
+
 class InvoiceItem(models.Model):
     invoice = models.ForeignKey(Invoice, on_delete=models.CASCADE, related_name="bills")
     product = models.ForeignKey(
@@ -240,11 +309,16 @@ class InvoiceItem(models.Model):
     unit_price = models.DecimalField(max_digits=10, decimal_places=2)
     discount_amount = models.DecimalField(max_digits=10, decimal_places=2, default=0)
     created_at = models.DateTimeField(default=timezone.now)
+    # Business day of the invoice, even for lines added by a later edit
+    business_date = models.DateField(editable=False)
+
+    objects = BusinessDateQuerySet.as_manager()
 
     class Meta:
         ordering = ["created_at"]
         indexes = [
             models.Index(fields=["invoice"]),
+            models.Index(fields=["business_date"]),
         ]
 
     def __str__(self):
@@ -252,6 +326,14 @@ class InvoiceItem(models.Model):
             return f"{self.quantity}"
         return "No Product"
 
+    def fill_business_date(self):
+        if self.business_date is None:
+            self.business_date = self.invoice.business_date
+
+    def save(self, *args, **kwargs):
+        self.fill_business_date()
+        super().save(*args, **kwargs)
+
     @property
     def line_total(self):
         try:
@@ -290,14 +372,29 @@ class Payment(models.Model):
     notes = models.TextField(blank=True, null=True)
     description = models.TextField(blank=True, null=True)
     created_at = models.DateTimeField(default=timezone.now)
+    # Local day the payment was taken
+    business_date = models.DateField(editable=False)
 
     received_by = models.ForeignKey(
         User, on_delete=models.SET_NULL, null=True, related_name="received_payments"
     )
 
+    objects = BusinessDateQuerySet.as_manager()
+
+    class Meta:
+        indexes = [models.Index(fields=["business_date"])]
+
     def __str__(self):
         return f"Payment {self.amount} - {self.invoice.invoice_number}"  # models.py
 
+    def fill_business_date(self):
+        if self.business_date is None:
+            self.business_date = local_date(self.created_at)
+
+    def save(self, *args, **kwargs):
+        self.fill_business_date()
+        super().save(*args, **kwargs)
+
 
 class ItemActivity(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
@@ -325,6 +422,42 @@ class ItemActivity(models.Model):
     remarks = models.TextField(blank=True)
 
 
+class KitchenTicket(models.Model):
+    """
+    The part of an invoice one kitchen has to prepare, denormalized so
+    kitchen screens can load their open tickets without whole invoices.
+    """
+
+    invoice = models.ForeignKey(
+        Invoice, on_delete=models.CASCADE, related_name="kitchen_tickets"
+    )
+    branch = models.ForeignKey(
+        Branch, on_delete=models.CASCADE, related_name="kitchen_tickets"
+    )
+    kitchentype = models.ForeignKey(
+        Kitchentype, on_delete=models.CASCADE, related_name="kitchen_tickets"
+    )
+    invoice_number = models.CharField(max_length=50, blank=True)
+    table_no = models.IntegerField(default=1)
+    floor_name = models.CharField(max_length=25, blank=True)
+    description = models.TextField(blank=True, null=True)
+    status = models.CharField(
+        max_length=10, choices=Invoice.INVOICE_STATUS_CHOICES, default="PENDING"
+    )
+    # [{"product": id, "name": str, "quantity": int}, ...]
+    items = models.JSONField(default=list)
+    created_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        ordering = ["created_at"]
+        indexes = [
+            models.Index(fields=["branch", "kitchentype", "status", "created_at"]),
+        ]
+
+    def __str__(self):
+        return f"Ticket {self.invoice_number} ({self.kitchentype_id})"
+
+
 class Notification(models.Model):
     invoice = models.ForeignKey(Invoice, on_delete=models.CASCADE, related_name='notifications')
     kitchen_user = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='kitchen_notifications')
@@ -335,3 +468,133 @@ class Notification(models.Model):
 
     class Meta:
         ordering = ["-created_at"]
+
+
+# ------------------------------------------------------------------
+# Sales rollups: per business day aggregates of invoices, maintained by
+# api.rollups on every invoice, item and payment write. Reports read these
+# instead of scanning raw rows.
+#
+# Status, product and payment rollups come in three tiers: DAY rows are
+# built from raw data, WEEK (Monday to Sunday) and MONTH rows from the DAY
+# rows. business_date is the first day of the row's period.
+# ------------------------------------------------------------------
+
+ROLLUP_PERIOD_CHOICES = [
+    ("DAY", "Day"),
+    ("WEEK", "Week"),
+    ("MONTH", "Month"),
+]
+
+
+class SalesHourRollup(models.Model):
+    """Invoices of one branch, business date and hour, per payment status."""
+
+    branch = models.ForeignKey(
+        Branch, on_delete=models.CASCADE, related_name="sales_hour_rollups"
+    )
+    business_date = models.DateField()
+    hour = models.PositiveSmallIntegerField()
+    payment_status = models.CharField(
+        max_length=15, choices=Invoice.PAYMENT_STATUS_CHOICES
+    )
+    invoice_count = models.PositiveIntegerField(default=0)
+    total_amount = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["branch", "business_date", "hour", "payment_status"],
+                name="unique_sales_hour_rollup",
+            )
+        ]
+        indexes = [models.Index(fields=["business_date"])]
+
+    def __str__(self):
+        return f"{self.branch_id} {self.business_date} {self.hour}h {self.payment_status}"
+
+
+class SalesStatusRollup(models.Model):
+    """Invoices per branch, period and payment status."""
+
+    branch = models.ForeignKey(
+        Branch, on_delete=models.CASCADE, related_name="sales_status_rollups"
+    )
+    period = models.CharField(max_length=5, choices=ROLLUP_PERIOD_CHOICES, default="DAY")
+    business_date = models.DateField()
+    payment_status = models.CharField(
+        max_length=15, choices=Invoice.PAYMENT_STATUS_CHOICES
+    )
+    invoice_count = models.PositiveIntegerField(default=0)
+    total_amount = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["branch", "period", "business_date", "payment_status"],
+                name="unique_sales_status_rollup",
+            )
+        ]
+        indexes = [models.Index(fields=["period", "business_date"])]
+
+    def __str__(self):
+        return f"{self.branch_id} {self.period} {self.business_date} {self.payment_status}"
+
+
+class SalesProductRollup(models.Model):
+    """Items sold per branch, period and product."""
+
+    branch = models.ForeignKey(
+        Branch, on_delete=models.CASCADE, related_name="sales_product_rollups"
+    )
+    period = models.CharField(max_length=5, choices=ROLLUP_PERIOD_CHOICES, default="DAY")
+    business_date = models.DateField()
+    product = models.ForeignKey(
+        Product,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name="sales_rollups",
+    )
+    quantity = models.PositiveIntegerField(default=0)
+    total_amount = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["branch", "period", "business_date", "product"],
+                name="unique_sales_product_rollup",
+            )
+        ]
+        indexes = [models.Index(fields=["period", "business_date"])]
+
+    def __str__(self):
+        return f"{self.branch_id} {self.period} {self.business_date} product {self.product_id}"
+
+
+class SalesPaymentRollup(models.Model):
+    """
+    Payments per branch, period and method. Payments are dated by their
+    invoice, like the dashboard has always reported them.
+    """
+
+    branch = models.ForeignKey(
+        Branch, on_delete=models.CASCADE, related_name="sales_payment_rollups"
+    )
+    period = models.CharField(max_length=5, choices=ROLLUP_PERIOD_CHOICES, default="DAY")
+    business_date = models.DateField()
+    payment_method = models.CharField(max_length=20)
+    payment_count = models.PositiveIntegerField(default=0)
+    amount = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["branch", "period", "business_date", "payment_method"],
+                name="unique_sales_payment_rollup",
+            )
+        ]
+        indexes = [models.Index(fields=["period", "business_date"])]
+
+    def __str__(self):
+        return f"{self.branch_id} {self.period} {self.business_date} {self.payment_method}"
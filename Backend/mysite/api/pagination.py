@@ -0,0 +1,72 @@
+import base64
+import json
+from datetime import datetime
+
+from django.db.models import Q
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def encode_cursor(created_at, pk):
+    raw = json.dumps([created_at.isoformat(), pk]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor):
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        created_at, pk = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        return datetime.fromisoformat(created_at), int(pk)
+    except (ValueError, TypeError):
+        raise InvalidCursor("Invalid cursor")
+
+
+def get_page_size(query_params):
+    try:
+        page_size = int(query_params.get("page_size", DEFAULT_PAGE_SIZE))
+    except (TypeError, ValueError):
+        page_size = DEFAULT_PAGE_SIZE
+    return max(1, min(page_size, MAX_PAGE_SIZE))
+
+
+def keyset_page(queryset, cursor=None, page_size=DEFAULT_PAGE_SIZE):
+    """
+    Newest-first keyset page over (created_at, id).
+
+    Each page is a range scan that continues after the last row of the
+    previous one, so its cost does not depend on how deep the client has
+    paged and no COUNT(*) is needed. Returns (rows, next_cursor) where
+    next_cursor is None on the last page.
+    """
+    queryset = queryset.order_by("-created_at", "-id")
+    if cursor:
+        created_at, pk = decode_cursor(cursor)
+        queryset = queryset.filter(
+            Q(created_at__lt=created_at) | Q(created_at=created_at, id__lt=pk)
+        )
+
+    rows = list(queryset[: page_size + 1])
+    if len(rows) <= page_size:
+        return rows, None
+    rows = rows[:page_size]
+    return rows, encode_cursor(rows[-1].created_at, rows[-1].id)
+
+
+def encode_watermark(moment):
+    return base64.urlsafe_b64encode(moment.isoformat().encode()).decode().rstrip("=")
+
+
+def decode_watermark(token):
+    try:
+        padded = token + "=" * (-len(token) % 4)
+        moment = datetime.fromisoformat(base64.urlsafe_b64decode(padded.encode()).decode())
+    except (ValueError, TypeError, UnicodeDecodeError):
+        raise InvalidCursor("Invalid watermark")
+    if moment.tzinfo is None:
+        raise InvalidCursor("Invalid watermark")
+    return moment
@@ -0,0 +1,357 @@
+import contextvars
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.db import close_old_connections, transaction
+from django.db.models import Count, DecimalField, ExpressionWrapper, F, Q, Sum
+from django.db.models.functions import ExtractHour
+from django.dispatch import Signal
+
+from .models import (
+    Branch,
+    Invoice,
+    InvoiceItem,
+    Payment,
+    SalesHourRollup,
+    SalesPaymentRollup,
+    SalesProductRollup,
+    SalesStatusRollup,
+)
+
+logger = logging.getLogger(__name__)
+
+# (branch_id, business_date) days touched during the current request,
+# handed to the refresh worker by SalesRollupsMiddleware once the
+# response is ready
+_request_days = contextvars.ContextVar("rollup_days", default=None)
+
+# One worker refreshes rollups off the request thread, one batch at a time
+_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="sales-rollups")
+# Days waiting for the worker, failed ones included until they succeed
+_dirty_days = set()
+_dirty_lock = threading.Lock()
+_drain_scheduled = False
+# Seconds before days whose refresh failed are tried again
+RETRY_DELAY = 30
+
+# Coarsest first, as tried by plan_periods()
+ROLLUP_PERIODS = ("MONTH", "WEEK", "DAY")
+
+# Sent with `branch_ids` and their (branch_id, business_date) `days` once
+# their rollups have been recomputed
+rollups_refreshed = Signal()
+
+LINE_TOTAL = ExpressionWrapper(
+    F("quantity") * F("unit_price") - F("discount_amount"),
+    output_field=DecimalField(max_digits=12, decimal_places=2),
+)
+
+
+def invoice_day(invoice):
+    return (invoice.branch_id, invoice.business_date)
+
+
+def mark_rollups_dirty(days):
+    """
+    Schedule a rollup refresh of (branch_id, business_date) days once the
+    surrounding transaction commits. Inside a request all days are handed
+    to the background worker together at the end; elsewhere they are
+    refreshed right after the commit.
+    """
+    days = set(days)
+    if days:
+        transaction.on_commit(lambda: _committed(days))
+
+
+def _committed(days):
+    pending = _request_days.get()
+    if pending is not None:
+        pending.update(days)
+    else:
+        schedule_refresh(refresh_sales_rollups(days))
+
+
+def start_collecting():
+    return _request_days.set(set())
+
+
+def stop_collecting(token):
+    """Stop collecting and return the days that need a refresh."""
+    days = _request_days.get() or set()
+    _request_days.reset(token)
+    return days
+
+
+def schedule_refresh(days):
+    """Refresh (branch_id, business_date) days on the background worker."""
+    global _drain_scheduled
+    with _dirty_lock:
+        _dirty_days.update(days)
+        if _drain_scheduled or not _dirty_days:
+            return
+        _drain_scheduled = True
+    _executor.submit(_drain)
+
+
+def _drain():
+    global _drain_scheduled
+    with _dirty_lock:
+        days = set(_dirty_days)
+        _dirty_days.clear()
+        # Days marked from now on need another run
+        _drain_scheduled = False
+
+    close_old_connections()
+    try:
+        failed = refresh_sales_rollups(days)
+    except Exception as e:
+        logger.error(f"Failed to refresh sales rollups: {e}")
+        failed = days
+    finally:
+        close_old_connections()
+
+    if failed:
+        # Keep them dirty instead of letting the rollups drift
+        with _dirty_lock:
+            _dirty_days.update(failed)
+        retry = threading.Timer(RETRY_DELAY, schedule_refresh, args=((),))
+        retry.daemon = True
+        retry.start()
+
+
+def period_start(period, day):
+    """First day of the DAY, WEEK (from Monday) or MONTH containing `day`."""
+    if period == "WEEK":
+        return day - timedelta(days=day.weekday())
+    if period == "MONTH":
+        return day.replace(day=1)
+    return day
+
+
+def period_end(period, start):
+    """Last day of the period starting on `start`."""
+    if period == "WEEK":
+        return start + timedelta(days=6)
+    if period == "MONTH":
+        return (start + timedelta(days=32)).replace(day=1) - timedelta(days=1)
+    return start
+
+
+def _whole_periods(period, start, end):
+    """First and last start of the whole periods inside [start, end], if any."""
+    first = period_start(period, start)
+    if first < start:
+        first = period_end(period, first) + timedelta(days=1)
+    last = period_start(period, end)
+    if period_end(period, last) > end:
+        last = period_start(period, last - timedelta(days=1))
+    if last < first:
+        return None
+    return first, last
+
+
+def plan_periods(start, end, periods=ROLLUP_PERIODS):
+    """
+    Cover [start, end] with the coarsest rollup rows: whole months, then
+    whole weeks for the edges, then single days for what is left. Returns
+    (period, first_start, last_start) runs, a year being at most two day
+    runs, two week runs and one month run.
+    """
+    if start > end:
+        return []
+    period, finer = periods[0], periods[1:]
+    if not finer:
+        return [(period, start, end)]
+    whole = _whole_periods(period, start, end)
+    if whole is None:
+        return plan_periods(start, end, finer)
+    first, last = whole
+    return (
+        plan_periods(start, first - timedelta(days=1), finer)
+        + [(period, first, last)]
+        + plan_periods(period_end(period, last) + timedelta(days=1), end, finer)
+    )
+
+
+def period_filter(start, end, prefix=""):
+    """
+    Q selecting the tiered rollup rows that add up to exactly [start, end].
+    `prefix` is the lookup path to the rollup model, e.g. "sales_status_rollups__".
+    """
+    runs = plan_periods(start, end)
+    if not runs:
+        return Q(**{f"{prefix}pk__in": []})
+    q = Q()
+    for period, first, last in runs:
+        q |= Q(
+            **{
+                f"{prefix}period": period,
+                f"{prefix}business_date__gte": first,
+                f"{prefix}business_date__lte": last,
+            }
+        )
+    return q
+
+
+def aggregate_day(branch_id, day):
+    """
+    Compute the DAY rollup rows of one branch and business day from raw
+    invoices, items and payments.
+    Returns unsaved (hours, statuses, products, payments).
+    """
+    invoice_filter = {"branch_id": branch_id, "business_date": day}
+    related_filter = {"invoice__branch_id": branch_id, "invoice__business_date": day}
+    key = {"branch_id": branch_id, "business_date": day}
+
+    hours = [
+        SalesHourRollup(**key, **row)
+        for row in Invoice.objects.filter(**invoice_filter)
+        .annotate(hour=ExtractHour("created_at"))
+        .values("hour", "payment_status")
+        .annotate(invoice_count=Count("id"), total_amount=Sum("total_amount"))
+        .order_by()
+    ]
+    statuses = {}
+    for hour in hours:
+        status = statuses.setdefault(
+            hour.payment_status,
+            SalesStatusRollup(**key, period="DAY", payment_status=hour.payment_status),
+        )
+        status.invoice_count += hour.invoice_count
+        status.total_amount += hour.total_amount
+    products = [
+        SalesProductRollup(**key, period="DAY", **row)
+        for row in InvoiceItem.objects.filter(**related_filter)
+        .values("product_id")
+        .annotate(total_amount=Sum(LINE_TOTAL), quantity=Sum("quantity"))
+        .order_by()
+    ]
+    payments = [
+        SalesPaymentRollup(**key, period="DAY", **row)
+        for row in Payment.objects.filter(**related_filter)
+        .values("payment_method")
+        .annotate(payment_count=Count("id"), amount=Sum("amount"))
+        .order_by()
+    ]
+    return hours, list(statuses.values()), products, payments
+
+
+def aggregate_period(branch_id, period, start):
+    """
+    Compute the WEEK or MONTH rollup rows starting on `start` from the DAY
+    rows they cover. Returns unsaved (statuses, products, payments).
+    """
+    days = {
+        "branch_id": branch_id,
+        "period": "DAY",
+        "business_date__gte": start,
+        "business_date__lte": period_end(period, start),
+    }
+    key = {"branch_id": branch_id, "period": period, "business_date": start}
+
+    statuses = [
+        SalesStatusRollup(**key, **row)
+        for row in SalesStatusRollup.objects.filter(**days)
+        .values("payment_status")
+        .annotate(invoice_count=Sum("invoice_count"), total_amount=Sum("total_amount"))
+        .order_by()
+    ]
+    products = [
+        SalesProductRollup(**key, **row)
+        for row in SalesProductRollup.objects.filter(**days)
+        .values("product_id")
+        .annotate(quantity=Sum("quantity"), total_amount=Sum("total_amount"))
+        .order_by()
+    ]
+    payments = [
+        SalesPaymentRollup(**key, **row)
+        for row in SalesPaymentRollup.objects.filter(**days)
+        .values("payment_method")
+        .annotate(payment_count=Sum("payment_count"), amount=Sum("amount"))
+        .order_by()
+    ]
+    return statuses, products, payments
+
+
+def _replace_rows(branch_id, period, start, tables):
+    """Swap the rows of one branch and period for the freshly computed ones."""
+    for model, rows in tables:
+        stored = model.objects.filter(branch_id=branch_id, business_date=start)
+        if model is not SalesHourRollup:
+            stored = stored.filter(period=period)
+        stored.delete()
+        model.objects.bulk_create(rows)
+
+
+def _lock_branch(branch_id):
+    # NO KEY UPDATE does not block invoices referencing the branch
+    list(Branch.objects.select_for_update(no_key=True).filter(id=branch_id))
+
+
+def refresh_sales_rollups(days):
+    """
+    Recompute the rollups of the given (branch_id, business_date) days, then
+    the weeks and months containing them.
+
+    Each day or period is replaced in its own short transaction while
+    holding a lock on the branch row, so concurrent refreshes of a branch
+    run one after another and the last one always sees every committed write.
+    Returns the days whose day, week or month rollups could not be refreshed.
+    """
+    refreshed = set()
+    failed = set()
+    # (branch_id, period, start) -> days touched within it
+    periods = {}
+    for branch_id, day in sorted(days):
+        try:
+            with transaction.atomic():
+                _lock_branch(branch_id)
+                hours, statuses, products, payments = aggregate_day(branch_id, day)
+                _replace_rows(
+                    branch_id,
+                    "DAY",
+                    day,
+                    (
+                        (SalesHourRollup, hours),
+                        (SalesStatusRollup, statuses),
+                        (SalesProductRollup, products),
+                        (SalesPaymentRollup, payments),
+                    ),
+                )
+            refreshed.add((branch_id, day))
+            for period in ("WEEK", "MONTH"):
+                periods.setdefault((branch_id, period, period_start(period, day)), set()).add(
+                    (branch_id, day)
+                )
+        except Exception as e:
+            logger.error(f"Failed to refresh sales rollups for {branch_id} {day}: {e}")
+            failed.add((branch_id, day))
+
+    for (branch_id, period, start), period_days in sorted(periods.items()):
+        try:
+            with transaction.atomic():
+                _lock_branch(branch_id)
+                statuses, products, payments = aggregate_period(branch_id, period, start)
+                _replace_rows(
+                    branch_id,
+                    period,
+                    start,
+                    (
+                        (SalesStatusRollup, statuses),
+                        (SalesProductRollup, products),
+                        (SalesPaymentRollup, payments),
+                    ),
+                )
+        except Exception as e:
+            logger.error(f"Failed to refresh {period} sales rollups for {branch_id} {start}: {e}")
+            failed.update(period_days)
+
+    if refreshed:
+        rollups_refreshed.send(
+            sender=None,
+            branch_ids={branch_id for branch_id, _ in refreshed},
+            days=refreshed,
+        )
+    return failed
@@ -1,16 +1,353 @@
 from decimal import Decimal
 
-from asgiref.sync import async_to_sync
-from channels.layers import get_channel_layer
 from django.db import transaction
-from django.utils import timezone
+from django.db.models import Case, F, IntegerField, Prefetch, Value, When
 from rest_framework import serializers
 
-from ..models import Invoice, InvoiceItem  # adjust import path if needed
-from .item_activity_serializer import ItemActivitySerializer
+from ..events import publish_invoice_event
+from ..invoice_numbers import allocate_invoice_numbers
+from ..kitchen_tickets import create_kitchen_tickets, rebuild_kitchen_tickets
+from ..rollups import invoice_day, mark_rollups_dirty
+from ..models import (
+    Branch,
+    Customer,
+    Floor,
+    Invoice,
+    InvoiceItem,
+    ItemActivity,
+    Payment,
+    Product,
+)
+
+COUNTER_ROLES = ["COUNTER", "ADMIN", "BRANCH_MANAGER", "SUPER_ADMIN"]
+
+
+def _add_pk(pks, value):
+    try:
+        pks.add(int(value))
+    except (TypeError, ValueError):
+        pass
+
+
+def prefetch_invoice_relations(orders, context):
+    """
+    Resolve the branches, customers, floors and products referenced by raw
+    invoice payloads with one query per model, into context["prefetched"]
+    where PrefetchedRelatedField picks them up. Ids already there are not
+    fetched again.
+    """
+    wanted = {Branch: set(), Customer: set(), Floor: set(), Product: set()}
+    for order in orders:
+        if not hasattr(order, "get"):
+            continue
+        _add_pk(wanted[Branch], order.get("branch"))
+        _add_pk(wanted[Customer], order.get("customer"))
+        _add_pk(wanted[Floor], order.get("floor"))
+        items = order.get("items")
+        if isinstance(items, list):
+            for item in items:
+                if hasattr(item, "get"):
+                    _add_pk(wanted[Product], item.get("product"))
+
+    prefetched = context.setdefault("prefetched", {})
+    for model, pks in wanted.items():
+        cache = prefetched.setdefault(model, {})
+        missing = pks - cache.keys()
+        if missing:
+            cache.update(model.objects.in_bulk(missing))
+
+
+def invoice_payment_status(paid_amount, total_amount, role):
+    """Payment status of a new invoice (PAY LATER stays PENDING)."""
+    if paid_amount >= total_amount and role in COUNTER_ROLES:
+        return "PAID"
+    elif paid_amount > 0:
+        return "PARTIAL"
+    return "PENDING"
+
+
+def create_invoice_items(lines, remarks=""):
+    """
+    Insert the line items of new invoices and take them out of stock.
+
+    `lines` is a list of (invoice, items_data) pairs. Works in a fixed number
+    of queries whatever the number of lines: one locked product fetch, one
+    bulk insert for the items, one set-based stock UPDATE and one bulk
+    insert for the SALES item activities.
+    """
+    product_ids = {
+        item_data["product"].id
+        for _, items_data in lines
+        for item_data in items_data
+        if item_data.get("product")
+    }
+    products = Product.objects.select_for_update().in_bulk(product_ids)
+
+    items = []
+    activities = []
+    sold = {}
+    for invoice, items_data in lines:
+        for item_data in items_data:
+            item = InvoiceItem(invoice=invoice, **item_data)
+            items.append(item)
+
+            product = products.get(item.product_id)
+            if product is None:
+                continue
+            # Same running stock figure the per-line save used to log
+            product.product_quantity -= item.quantity
+            sold[product.id] = sold.get(product.id, 0) + item.quantity
+            activities.append(
+                ItemActivity(
+                    change=str(item.quantity),
+                    quantity=product.product_quantity,
+                    product=product,
+                    types="SALES",
+                    remarks=remarks,
+                )
+            )
+
+    InvoiceItem.objects.bulk_create(items)
+
+    if sold:
+        take_out_of_stock(sold)
+        ItemActivity.objects.bulk_create(activities)
+
+
+def take_out_of_stock(sold):
+    """Decrement stock for {product_id: quantity} in one UPDATE (negative puts back)."""
+    Product.objects.filter(id__in=sold).update(
+        product_quantity=F("product_quantity")
+        - Case(
+            *[When(id=pid, then=Value(qty)) for pid, qty in sold.items()],
+            default=Value(0),
+            output_field=IntegerField(),
+        )
+    )
+
+
+ITEM_DIFF_FIELDS = ["quantity", "unit_price", "discount_amount"]
+
+
+def update_invoice_items(invoice, items_data, remarks=""):
+    """
+    Bring an invoice's line items in line with `items_data` in place.
+
+    Incoming lines are matched to existing rows of the same product (identical
+    lines first), so only changed rows are written: one bulk insert, one bulk
+    update and one delete at most. Stock is moved by the net quantity change
+    per product, with one ItemActivity per product that changed.
+    Returns (subtotal, stats) where stats counts inserted/updated/deleted rows.
+    """
+    remaining = {}
+    for item in invoice.bills.all():
+        remaining.setdefault(item.product_id, []).append(item)
+
+    old_quantities = {}
+    for product_id, rows in remaining.items():
+        old_quantities[product_id] = sum(row.quantity for row in rows)
+
+    def values(item_data):
+        return (
+            item_data["quantity"],
+            item_data["unit_price"],
+            item_data.get("discount_amount", Decimal("0.00")),
+        )
+
+    # First pass keeps identical lines untouched
+    unmatched = []
+    for item_data in items_data:
+        product = item_data.get("product")
+        rows = remaining.get(product.id if product else None, [])
+        same = next(
+            (
+                row
+                for row in rows
+                if (row.quantity, row.unit_price, row.discount_amount) == values(item_data)
+            ),
+            None,
+        )
+        if same is not None:
+            rows.remove(same)
+        else:
+            unmatched.append(item_data)
+
+    # Second pass rewrites another line of the same product, else inserts
+    to_insert = []
+    to_update = []
+    for item_data in unmatched:
+        product = item_data.get("product")
+        rows = remaining.get(product.id if product else None, [])
+        if rows:
+            row = rows.pop(0)
+            row.quantity, row.unit_price, row.discount_amount = values(item_data)
+            to_update.append(row)
+        else:
+            to_insert.append(InvoiceItem(invoice=invoice, **item_data))
+
+    to_delete = [row.id for rows in remaining.values() for row in rows]
+
+    if to_delete:
+        InvoiceItem.objects.filter(id__in=to_delete).delete()
+    if to_update:
+        InvoiceItem.objects.bulk_update(to_update, ITEM_DIFF_FIELDS)
+    if to_insert:
+        InvoiceItem.objects.bulk_create(to_insert)
+
+    # Net stock change per product
+    new_quantities = {}
+    for item_data in items_data:
+        product = item_data.get("product")
+        if product:
+            new_quantities[product.id] = new_quantities.get(product.id, 0) + item_data["quantity"]
+    deltas = {
+        product_id: new_quantities.get(product_id, 0) - old_quantities.get(product_id, 0)
+        for product_id in set(new_quantities) | set(old_quantities)
+        if product_id is not None
+    }
+    deltas = {product_id: delta for product_id, delta in deltas.items() if delta}
+
+    if deltas:
+        products = Product.objects.select_for_update().in_bulk(deltas)
+        take_out_of_stock(deltas)
+        ItemActivity.objects.bulk_create(
+            [
+                ItemActivity(
+                    change=str(abs(delta)),
+                    quantity=products[product_id].product_quantity - delta,
+                    product_id=product_id,
+                    # More sold is a sale, fewer sold puts stock back
+                    types="SALES" if delta > 0 else "EDIT_STOCK",
+                    remarks=remarks,
+                )
+                for product_id, delta in deltas.items()
+                if product_id in products
+            ]
+        )
+
+    subtotal = sum(
+        (quantity * unit_price - discount for quantity, unit_price, discount in map(values, items_data)),
+        Decimal("0.00"),
+    )
+    stats = {
+        "inserted": len(to_insert),
+        "updated": len(to_update),
+        "deleted": len(to_delete),
+    }
+    mark_rollups_dirty([invoice_day(invoice)])
+    return subtotal, stats
+
+
+def create_invoices(orders, user, branch_id, remarks=""):
+    """
+    Create invoices from validated InvoiceSerializer data, together with
+    their items, initial payments and stock movements.
+
+    All orders belong to `branch_id` and get one block of invoice numbers.
+    Query count does not grow with the number of orders or lines. Must run
+    inside a transaction; returns the saved invoices in order.
+    """
+    role = getattr(user, "user_type", None)
+    numbers = allocate_invoice_numbers(branch_id, count=len(orders))
+
+    invoices = []
+    lines = []
+    payments = []
+    for order, invoice_number in zip(orders, numbers):
+        order = dict(order)
+        items_data = order.pop("items")
+        paid_amount = order.pop("paid_amount", Decimal("0.00"))
+        payment_method = order.pop("payment_method", None) or "CASH"
+
+        subtotal = sum(
+            (
+                item_data["quantity"] * item_data["unit_price"]
+                - item_data.get("discount_amount", Decimal("0.00"))
+                for item_data in items_data
+            ),
+            Decimal("0.00"),
+        )
+        total_amount = (
+            subtotal
+            + (order.get("tax_amount") or Decimal("0.00"))
+            - (order.get("discount") or Decimal("0.00"))
+        )
+
+        invoice = Invoice(
+            **order,
+            invoice_number=invoice_number,
+            created_by=user,
+            subtotal=subtotal,
+            total_amount=total_amount,
+            paid_amount=paid_amount,
+            payment_status=invoice_payment_status(paid_amount, total_amount, role),
+        )
+
+        # Log who received the initial payment
+        if paid_amount > 0 and user:
+            payments.append(
+                Payment(
+                    invoice=invoice,
+                    amount=paid_amount,
+                    payment_method=payment_method,
+                    received_by=user,
+                    notes="Initial payment during invoice creation",
+                )
+            )
+            if role == "WAITER":
+                invoice.received_by_waiter = user
+            elif role in COUNTER_ROLES:
+                invoice.received_by_counter = user
+
+        invoices.append(invoice)
+        lines.append((invoice, items_data))
+
+    Invoice.objects.bulk_create(invoices)
+    create_invoice_items(lines, remarks=remarks)
+    create_kitchen_tickets(lines)
+    Payment.objects.bulk_create(payments)
+    mark_rollups_dirty(invoice_day(invoice) for invoice in invoices)
+    return invoices
+
+
+def broadcast_invoices_created(invoices):
+    """
+    Notify all screens via WebSocket (kitchen, waiter, counter) with a single
+    event, however many invoices were created. Sent after commit.
+    """
+    if not invoices:
+        return
+    publish_invoice_event(
+        {
+            "type": "invoice_created",
+            "invoice_id": str(invoices[-1].id),
+            "invoice_ids": [str(invoice.id) for invoice in invoices],
+        }
+    )
+
+
+class PrefetchedRelatedField(serializers.PrimaryKeyRelatedField):
+    """
+    Primary key lookup that first checks the objects prefetched into
+    context["prefetched"], so validating orders is not one query per field.
+    """
+
+    def to_internal_value(self, data):
+        cache = self.context.get("prefetched", {}).get(self.queryset.model)
+        if cache:
+            try:
+                obj = cache.get(int(data))
+            except (TypeError, ValueError):
+                obj = None
+            if obj is not None:
+                return obj
+        return super().to_internal_value(data)
 
 
 class InvoiceItemSerializer(serializers.ModelSerializer):
+    product = PrefetchedRelatedField(
+        queryset=Product.objects.all(), allow_null=True, required=False
+    )
     product_name = serializers.CharField(source="product.name", read_only=True)
 
     class Meta:
@@ -32,6 +369,13 @@ class InvoiceSerializer(serializers.ModelSerializer):
     """
 
     items = InvoiceItemSerializer(many=True)
+    branch = PrefetchedRelatedField(queryset=Branch.objects.all())
+    customer = PrefetchedRelatedField(
+        queryset=Customer.objects.all(), allow_null=True, required=False
+    )
+    floor = PrefetchedRelatedField(
+        queryset=Floor.objects.all(), allow_null=True, required=False
+    )
     paid_amount = serializers.DecimalField(
         max_digits=15,
         decimal_places=2,
@@ -67,46 +411,18 @@ class InvoiceSerializer(serializers.ModelSerializer):
             # Intentionally NO created_at, created_by, subtotal, total_amount, etc.
         ]
 
+    def to_internal_value(self, data):
+        # Resolve every related object referenced by the order up front
+        prefetch_invoice_relations([data], self.context)
+        return super().to_internal_value(data)
+
     @transaction.atomic
     def create(self, validated_data):
-        items_data = validated_data.pop("items")
-        paid_amount = validated_data.pop("paid_amount", Decimal("0.00"))
-        print("Yo customer le tireako amount ho hai sabina ji_>>> ",paid_amount)
-        payment_method = validated_data.pop("payment_method", "CASH")
         request = self.context.get("request")
         notes = validated_data.get("notes", "")
 
         user = request.user if request else None
 
-        # Create invoice skeleton
-        invoice = Invoice.objects.create(
-            **validated_data,
-            created_by=user,
-            subtotal=Decimal("0.00"),
-            total_amount=Decimal("0.00"),
-            paid_amount=paid_amount,
-            payment_status="PENDING",
-        )
-
-        # Log who received the initial payment
-        role = getattr(user, "user_type", None)
-        if paid_amount > 0 and user:
-            from ..models import Payment
-
-            Payment.objects.create(
-                invoice=invoice,
-                amount=paid_amount,
-                payment_method=payment_method,
-                received_by=user,
-                notes="Initial payment during invoice creation",
-            )
-            if role == "WAITER":
-                invoice.payment_status = "PARTIAL"
-                invoice.received_by_waiter = user
-            elif role in ["COUNTER", "BRANCH_MANAGER", "ADMIN", "SUPER_ADMIN"]:
-                invoice.received_by_counter = user
-
-        # Generate invoice number
         branch_id = self.context.get("branch")
         try:
             branch_id_int = int(branch_id)
@@ -118,98 +434,16 @@ class InvoiceSerializer(serializers.ModelSerializer):
                 {"branch": "Invalid branch for invoice creation."}
             )
 
-        today_date = timezone.localdate().strftime("%Y-%m-%d")
-        prefix = f"{branch_id_int:02d}-{today_date}"
-
-        # Find the latest invoice number for this branch for today
-        latest_today = (
-            Invoice.objects.filter(
-                branch=branch_id_int, invoice_number__startswith=prefix
-            )
-            .exclude(id=invoice.id)
-            .order_by("-invoice_number")
-            .first()
-        )
-
-        if latest_today and latest_today.invoice_number:
-            try:
-                seq = int(latest_today.invoice_number.split("-")[-1]) + 1
-            except Exception:
-                seq = 1
-        else:
-            seq = 1
-
-        final_invoice_no = f"{prefix}-{seq:02d}"
-
-        invoice.invoice_number = final_invoice_no
-
-        # Create items & calculate subtotal
-        subtotal = Decimal("0.00")
-        for item_data in items_data:
-            item = InvoiceItem.objects.create(invoice=invoice, **item_data)
-
-            item.product.product_quantity -= item.quantity
-            item.product.save()
-            line_total = item.quantity * item.unit_price - item.discount_amount
-            subtotal += line_total
-
-            itemactivity = {
-                "change": str(item.quantity),
-                "quantity": item.product.product_quantity,
-                "product": item.product_id,
-                "types": "SALES",
-                "remarks": notes,
-            }
-
-            itemserializer = ItemActivitySerializer(data=itemactivity)
-            itemserializer.is_valid(raise_exception=True)
-            itemserializer.save()
-
-        # Final totals
-        invoice.subtotal = subtotal
-        invoice.total_amount = (
-            subtotal
-            + (invoice.tax_amount or Decimal("0.00"))
-            - (invoice.discount or Decimal("0.00"))
+        (invoice,) = create_invoices(
+            [validated_data], user, branch_id_int, remarks=notes
         )
 
-        # Payment status logic for PAY LATER
-
-        if invoice.paid_amount >= invoice.total_amount and role in [
-            "COUNTER",
-            "ADMIN",
-            "BRANCH_MANAGER",
-            "SUPER_ADMIN",
-        ]:
-            invoice.payment_status = "PAID"
-        elif invoice.paid_amount > 0 and role == "WAITER" :
-            invoice.payment_status = "PARTIAL"
-        elif invoice.paid_amount>0:
-            invoice.payment_status = "PARTIAL"
-        else:
-            invoice.payment_status = "PENDING"
-
-        invoice.save()
-
-        # Notify all screens via WebSocket (kitchen, waiter, counter)
-        try:
-            channel_layer = get_channel_layer()
-            if channel_layer is not None:
-                message = {
-                    "type": "invoice_created",
-                    "invoice_id": str(invoice.id),
-                }
-                # Notify kitchen screens
-                async_to_sync(channel_layer.group_send)("kitchen_orders", message)
-                # Notify waiter/counter screens
-                async_to_sync(channel_layer.group_send)("orders", message)
-        except Exception:
-            pass
+        broadcast_invoices_created([invoice])
 
         return invoice
 
+    @transaction.atomic
     def update(self, instance, validated_data):
-        # For simplicity — you can expand this if partial updates of items are needed
         items_data = validated_data.pop("items", None)
         paid_amount = validated_data.pop("paid_amount", None)
         request = self.context.get("request")
@@ -224,12 +458,11 @@ class InvoiceSerializer(serializers.ModelSerializer):
             instance.paid_amount = paid_amount
 
         if items_data is not None:
-            # Simple approach: delete old items, create new ones
-            instance.bills.all().delete()  # assuming related_name="bills"
-            subtotal = Decimal("0.00")
-            for item_data in items_data:
-                item = InvoiceItem.objects.create(invoice=instance, **item_data)
-                subtotal += item.quantity * item.unit_price - item.discount_amount
+            subtotal, _ = update_invoice_items(
+                instance,
+                items_data,
+                remarks=f"Invoice {instance.invoice_number} edited",
+            )
             instance.subtotal = subtotal
             instance.total_amount = (
                 subtotal + (instance.tax_amount or 0) - (instance.discount or 0)
@@ -249,9 +482,31 @@ class InvoiceSerializer(serializers.ModelSerializer):
             instance.payment_status = "PENDING"
 
         instance.save()
+        rebuild_kitchen_tickets([instance])
         return instance
 
 
+def invoice_read_queryset(queryset=None):
+    """
+    Invoices prepared for InvoiceResponseSerializer: every relation it reads
+    is joined or prefetched, so serializing one invoice or a thousand costs
+    the same three queries (invoices, items with products, payments).
+    """
+    if queryset is None:
+        queryset = Invoice.objects.all()
+    return queryset.select_related(
+        "customer",
+        "branch",
+        "floor",
+        "created_by",
+        "received_by_waiter",
+        "received_by_counter",
+    ).prefetch_related(
+        Prefetch("bills", queryset=InvoiceItem.objects.select_related("product")),
+        "payments",
+    )
+
+
 class InvoiceResponseSerializer(serializers.ModelSerializer):
     """
     Used for GET / list / retrieve
@@ -315,5 +570,5 @@ class InvoiceResponseSerializer(serializers.ModelSerializer):
         return obj.total_amount - obj.paid_amount
 
     def get_payment_methods(self, obj):
-        print(list(obj.payments.values_list("payment_method", flat=True).distinct()))
-        return list(obj.payments.values_list("payment_method", flat=True).distinct())
+        # Read from the prefetched payments (see invoice_read_queryset)
+        return list(dict.fromkeys(payment.payment_method for payment in obj.payments.all()))
@@ -0,0 +1,22 @@
+from rest_framework import serializers
+
+from ..models import KitchenTicket
+
+
+class KitchenTicketSerializer(serializers.ModelSerializer):
+    created_at = serializers.DateTimeField(format="%Y-%m-%d %H:%M:%S", read_only=True)
+
+    class Meta:
+        model = KitchenTicket
+        fields = [
+            "id",
+            "invoice",
+            "invoice_number",
+            "kitchentype",
+            "table_no",
+            "floor_name",
+            "description",
+            "status",
+            "items",
+            "created_at",
+        ]
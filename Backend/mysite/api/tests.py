@@ -1,3 +1,461 @@
-from django.test import TestCase
+import copy
+import random
+import threading
+from collections import Counter
+from datetime import timedelta
+from decimal import Decimal
+from types import SimpleNamespace
 
-# Create your tests here.
+from django.db import connection, transaction
+from django.db.models import Q, Sum
+from django.test import SimpleTestCase, TestCase, TransactionTestCase, skipUnlessDBFeature
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from .invoice_numbers import allocate_invoice_numbers
+from .json_patch import diff
+from .models import (
+    Branch,
+    Customer,
+    Floor,
+    Invoice,
+    InvoiceItem,
+    ItemActivity,
+    Kitchentype,
+    Payment,
+    Product,
+    ProductCategory,
+    User,
+)
+from .serializer_dir.invoice_serializer import InvoiceSerializer, create_invoices
+from .views_dir.staff_view import staff_performance
+
+
+def create_branch(products=4, name="Test branch"):
+    """A branch with a kitchen, a product category and well stocked products."""
+    branch = Branch.objects.create(name=name, location="Test")
+    kitchen = Kitchentype.objects.create(name="Test kitchen", branch=branch)
+    category = ProductCategory.objects.create(
+        name="Test category", branch=branch, kitchentype=kitchen
+    )
+    products = Product.objects.bulk_create(
+        [
+            Product(
+                name=f"Product {i}",
+                category=category,
+                branch=branch,
+                selling_price=100,
+                product_quantity=1000,
+            )
+            for i in range(products)
+        ]
+    )
+    return branch, products
+
+
+def create_user(branch, user_type, username=None):
+    return User.objects.create(
+        username=username or f"{user_type.lower()}-{branch.id}",
+        user_type=user_type,
+        branch=branch,
+    )
+
+
+def create_invoice(branch, user, products, quantity=2):
+    """An unpaid invoice with one line of `quantity` per product, made as the POS does."""
+    serializer = InvoiceSerializer(
+        data={
+            "branch": branch.id,
+            "paid_amount": "0",
+            "items": [
+                {"product": product.id, "quantity": quantity, "unit_price": "100.00"}
+                for product in products
+            ],
+        },
+        context={"request": SimpleNamespace(user=user), "branch": branch.id},
+    )
+    serializer.is_valid(raise_exception=True)
+    return serializer.save()
+
+
+def apply_patch(document, ops):
+    """Apply add/remove/replace operations, as the dashboard SSE client does."""
+    document = copy.deepcopy(document)
+    for op in ops:
+        if op["path"] == "":
+            document = op["value"]
+            continue
+        keys = [
+            key.replace("~1", "/").replace("~0", "~")
+            for key in op["path"].split("/")[1:]
+        ]
+        last = keys.pop()
+        parent = document
+        for key in keys:
+            parent = parent[int(key)] if isinstance(parent, list) else parent[key]
+        if isinstance(parent, list):
+            last = int(last)
+        if op["op"] == "remove":
+            del parent[last]
+        else:
+            parent[last] = op["value"]
+    return document
+
+
+class JsonPatchDiffTests(SimpleTestCase):
+    def assertRoundTrip(self, old, new):
+        ops = diff(old, new)
+        self.assertEqual(apply_patch(old, ops), new)
+        return ops
+
+    def test_equal_documents_need_no_operations(self):
+        document = {"total_sales": 10.5, "peak_hours": ["10:00 AM"], "top": [{"id": 1}]}
+        self.assertEqual(self.assertRoundTrip(document, copy.deepcopy(document)), [])
+
+    def test_dict_keys_added_and_removed(self):
+        ops = self.assertRoundTrip(
+            {"total_sales": 10, "old_key": 1},
+            {"total_sales": 12, "new_key": {"nested": True}},
+        )
+        self.assertEqual(
+            ops,
+            [
+                {"op": "remove", "path": "/old_key"},
+                {"op": "replace", "path": "/total_sales", "value": 12},
+                {"op": "add", "path": "/new_key", "value": {"nested": True}},
+            ],
+        )
+
+    def test_equal_length_lists_are_diffed_item_by_item(self):
+        ops = self.assertRoundTrip(
+            {"weekly": [1, 2, 3], "items": [{"qty": 1}, {"qty": 2}]},
+            {"weekly": [1, 5, 3], "items": [{"qty": 1}, {"qty": 4}]},
+        )
+        self.assertEqual(
+            ops,
+            [
+                {"op": "replace", "path": "/weekly/1", "value": 5},
+                {"op": "replace", "path": "/items/1/qty", "value": 4},
+            ],
+        )
+
+    def test_changed_length_lists_are_replaced(self):
+        ops = self.assertRoundTrip({"orders": [1, 2]}, {"orders": [1, 2, 3]})
+        self.assertEqual(ops, [{"op": "replace", "path": "/orders", "value": [1, 2, 3]}])
+        self.assertRoundTrip({"orders": [1, 2, 3]}, {"orders": []})
+
+    def test_type_changes_are_replaced(self):
+        self.assertRoundTrip({"value": 1}, {"value": "1"})
+        self.assertRoundTrip({"value": [1]}, {"value": {"0": 1}})
+        self.assertRoundTrip({"value": None}, {"value": 0.0})
+        ops = self.assertRoundTrip([1, 2], {"a": 1})
+        self.assertEqual(ops, [{"op": "replace", "path": "", "value": {"a": 1}}])
+
+    def test_keys_with_tilde_and_slash_are_escaped(self):
+        ops = self.assertRoundTrip(
+            {"a/b": 1, "c~d": {"e/~f": 2}, "gone~/": 0},
+            {"a/b": 2, "c~d": {"e/~f": 3}, "new/~": 4},
+        )
+        self.assertEqual(
+            [op["path"] for op in ops],
+            ["/gone~0~1", "/a~1b", "/c~0d/e~1~0f", "/new~1~0"],
+        )
+
+
+class InvoiceCreateTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.branch, cls.products = create_branch(products=20)
+        cls.counter = create_user(cls.branch, "COUNTER")
+
+    def create_invoice(self, lines):
+        return create_invoice(self.branch, self.counter, self.products[:lines])
+
+    def test_query_count_does_not_grow_with_lines(self):
+        # The first invoice of the day also creates its number sequence
+        self.create_invoice(1)
+        with CaptureQueriesContext(connection) as one_line:
+            self.create_invoice(1)
+        with self.assertNumQueries(len(one_line)):
+            invoice = self.create_invoice(20)
+
+        self.assertEqual(invoice.bills.count(), 20)
+        self.assertEqual(invoice.subtotal, 20 * 2 * 100)
+
+    def test_lines_are_taken_out_of_stock(self):
+        self.create_invoice(3)
+
+        quantities = Product.objects.filter(branch=self.branch).values_list(
+            "product_quantity", flat=True
+        )
+        self.assertEqual(sorted(quantities), [998] * 3 + [1000] * 17)
+        self.assertEqual(ItemActivity.objects.filter(types="SALES").count(), 3)
+
+
+class InvoiceItemEditTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.branch, cls.products = create_branch(products=4)
+        cls.counter = create_user(cls.branch, "COUNTER")
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.counter)
+        self.invoice = create_invoice(self.branch, self.counter, self.products[:3])
+
+    def patch_items(self, quantities):
+        return self.client.patch(
+            f"/api/invoice/{self.invoice.id}/",
+            {
+                "items": [
+                    {"product": self.products[i].id, "quantity": quantity, "unit_price": "100.00"}
+                    for i, quantity in quantities.items()
+                ]
+            },
+            format="json",
+        )
+
+    def test_only_changed_lines_are_written(self):
+        unchanged = InvoiceItem.objects.get(invoice=self.invoice, product=self.products[0])
+
+        # Keep the first line, raise the second, drop the third, add the fourth
+        response = self.patch_items({0: 2, 1: 5, 3: 1})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            sorted((item["product"], item["quantity"]) for item in response.data["data"]["items"]),
+            [(self.products[0].id, 2), (self.products[1].id, 5), (self.products[3].id, 1)],
+        )
+        self.assertEqual(response.data["data"]["total_amount"], "800.00")
+        self.assertTrue(InvoiceItem.objects.filter(id=unchanged.id, quantity=2).exists())
+
+        stock = dict(Product.objects.filter(branch=self.branch).values_list("id", "product_quantity"))
+        self.assertEqual(
+            [stock[product.id] for product in self.products],
+            [998, 995, 1000, 999],
+        )
+
+    def test_items_of_a_paid_invoice_cannot_be_edited(self):
+        self.invoice.payment_status = "PAID"
+        self.invoice.save()
+
+        response = self.patch_items({0: 1})
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(self.invoice.bills.count(), 3)
+
+
+class InvoiceNumberTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.branch, _ = create_branch(products=0)
+
+    def test_allocation_locks_and_bumps_one_row(self):
+        first = allocate_invoice_numbers(self.branch.id)
+        # Lock and bump, inside the allocator's savepoint
+        with self.assertNumQueries(4):
+            batch = allocate_invoice_numbers(self.branch.id, count=10)
+
+        self.assertEqual(
+            [int(number.split("-")[-1]) for number in first + batch], list(range(1, 12))
+        )
+
+
+@skipUnlessDBFeature("has_select_for_update")
+class ConcurrentInvoiceNumberTests(TransactionTestCase):
+    threads = 8
+    per_thread = 25
+
+    def test_concurrent_tills_get_a_gap_free_sequence(self):
+        branch, _ = create_branch(products=0)
+        issued = []
+        errors = []
+        lock = threading.Lock()
+        start = threading.Barrier(self.threads)
+
+        def till():
+            numbers = []
+            try:
+                start.wait()
+                for _ in range(self.per_thread):
+                    with transaction.atomic():
+                        numbers.extend(allocate_invoice_numbers(branch.id))
+            except Exception as e:
+                errors.append(e)
+            finally:
+                connection.close()
+            with lock:
+                issued.extend(numbers)
+
+        tills = [threading.Thread(target=till) for _ in range(self.threads)]
+        for thread in tills:
+            thread.start()
+        for thread in tills:
+            thread.join()
+
+        self.assertEqual(errors, [])
+        self.assertEqual([n for n, seen in Counter(issued).items() if seen > 1], [])
+        self.assertEqual(
+            sorted(int(number.split("-")[-1]) for number in issued),
+            list(range(1, self.threads * self.per_thread + 1)),
+        )
+
+
+class InvoiceReadQueryTests(TestCase):
+    """Invoice reads cost the same queries whatever the invoices, items and payments."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.branch, cls.products = create_branch(products=4)
+        cls.floor = Floor.objects.create(name="Test floor", branch=cls.branch)
+        cls.customer = Customer.objects.create(name="Test customer", branch=cls.branch)
+        cls.waiter = create_user(cls.branch, "WAITER")
+        cls.manager = create_user(cls.branch, "BRANCH_MANAGER")
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.manager)
+
+    def add_invoices(self, count):
+        invoices = create_invoices(
+            [
+                {
+                    "branch": self.branch,
+                    "customer": self.customer,
+                    "floor": self.floor,
+                    "paid_amount": Decimal("10.00"),
+                    "items": [
+                        {"product": product, "quantity": 1, "unit_price": Decimal("10.00")}
+                        for product in self.products
+                    ],
+                }
+                for _ in range(count)
+            ],
+            self.waiter,
+            self.branch.id,
+        )
+        Payment.objects.bulk_create(
+            [
+                Payment(invoice=invoice, amount=1, payment_method="QR", received_by=self.manager)
+                for invoice in invoices
+            ]
+        )
+        return invoices
+
+    def assertConstantQueries(self, url, params=None):
+        invoice = self.add_invoices(1)[0]
+        with CaptureQueriesContext(connection) as one:
+            response = self.client.get(url.format(id=invoice.id), params)
+        self.assertEqual(response.status_code, 200)
+
+        self.add_invoices(49)
+        with self.assertNumQueries(len(one)):
+            response = self.client.get(url.format(id=invoice.id), params)
+        return response
+
+    def test_list(self):
+        response = self.assertConstantQueries("/api/invoice/")
+        self.assertGreater(len(response.data["data"]), 1)
+
+    def test_large_page(self):
+        response = self.assertConstantQueries("/api/invoice/", {"page_size": 200})
+        self.assertEqual(len(response.data["data"]), 50)
+
+    def test_detail(self):
+        self.assertConstantQueries("/api/invoice/{id}/")
+
+
+def staff_performance_per_member(branch, start_date, end_date):
+    """The staff report as it was computed before: three queries per staff member."""
+    staff_data = []
+    for staff in User.objects.filter(branch=branch, is_active=True).exclude(is_superuser=True):
+        invoices_all = (
+            Invoice.objects.filter(
+                branch=branch,
+                business_date__gte=start_date,
+                business_date__lte=end_date,
+            )
+            .filter(
+                Q(received_by_waiter=staff)
+                | Q(received_by_counter=staff)
+                | Q(created_by=staff)
+            )
+            .distinct()
+        )
+        total_sales = invoices_all.aggregate(total=Sum("total_amount"))["total"] or 0
+        total_cash_in_hand = invoices_all.filter(
+            received_by_waiter__user_type="WAITER", payment_status="PARTIAL"
+        ).aggregate(total_cash=Sum("total_amount"))["total_cash"] or 0
+        staff_data.append(
+            {
+                "id": staff.id,
+                "name": staff.full_name or staff.username,
+                "username": staff.username,
+                "role": staff.user_type,
+                "orders": invoices_all.count(),
+                "sales": float(total_sales),
+                "cash_in_hand": float(total_cash_in_hand),
+            }
+        )
+    return staff_data
+
+
+class StaffPerformanceTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        rng = random.Random(0)
+        cls.branch, _ = create_branch(products=0)
+        other, _ = create_branch(products=0, name="Other branch")
+        roles = ["WAITER", "COUNTER", "BRANCH_MANAGER", "KITCHEN"]
+        staff = User.objects.bulk_create(
+            [
+                User(
+                    username=f"staff-{i}",
+                    user_type=roles[i % len(roles)],
+                    branch=cls.branch,
+                    is_active=i % 10 != 9,
+                )
+                for i in range(40)
+            ]
+        )
+        people = staff + [create_user(other, "WAITER"), None]
+
+        now = timezone.now()
+        Invoice.objects.bulk_create(
+            [
+                Invoice(
+                    branch=rng.choice((cls.branch, cls.branch, other)),
+                    invoice_number=f"test-{i}",
+                    created_at=now - timedelta(minutes=rng.randint(0, 400 * 24 * 60)),
+                    total_amount=Decimal(rng.randint(100, 5000)) / 4,
+                    payment_status=rng.choice(("PAID", "PARTIAL", "PENDING")),
+                    created_by=rng.choice(people),
+                    # Often the same person in several roles
+                    received_by_waiter=rng.choice(people[:3] + [None]),
+                    received_by_counter=rng.choice(people[:3] + [None]),
+                )
+                for i in range(2000)
+            ]
+        )
+
+    def test_matches_the_per_member_report_in_two_queries(self):
+        today = timezone.localdate()
+        ranges = {
+            "daily": (today, today),
+            "weekly": (today - timedelta(days=today.weekday()), today),
+            "monthly": (today.replace(day=1), today),
+            "yearly": (today.replace(month=1, day=1), today),
+            "all": (today - timedelta(days=500), today),
+        }
+        for label, (start, end) in ranges.items():
+            with self.subTest(label):
+                with self.assertNumQueries(2):
+                    grouped = staff_performance(self.branch, start, end)
+                expected = staff_performance_per_member(self.branch, start, end)
+                self.assertEqual(
+                    sorted(grouped, key=lambda row: row["id"]),
+                    sorted(expected, key=lambda row: row["id"]),
+                )
+        # The generated invoices do land in the longest range
+        self.assertTrue(any(row["orders"] for row in grouped))
@@ -15,13 +15,17 @@ urlpatterns = [
     ),
     path("kitchentype/", views.KitchenView.as_view(), name="Kitchen"),
     path("kitchentype/<int:id>/", views.KitchenView.as_view(), name="Kitchen_details"),
+    path("kitchen/tickets/", views.KitchenTicketView.as_view(), name="kitchen-tickets"),
     path("branch/<int:id>/", views.BranchViewClass.as_view(), name="Branch_details"),
     path("branch/", views.BranchViewClass.as_view(), name="Branch"),
     path("customer/<int:id>/", views.CustomerView.as_view(), name="customer_details"),
     path("customer/", views.CustomerView.as_view(), name="customer"),
     path("invoice/", views.InvoiceViewClass.as_view(), name="Invoice_details"),
+    path("invoice/batch/", views.InvoiceBatchView.as_view(), name="invoice-batch"),
+    path("invoice/changes/", views.InvoiceChangesView.as_view(), name="invoice-changes"),
     path("invoice/<int:id>/", views.InvoiceViewClass.as_view(), name="Invoice"),
     path("payments/", views.PaymentView.as_view(), name="payment-list"),
+    path("export/<str:kind>/", views.ExportView.as_view(), name="export"),
     path(
         "invoice/<int:invoice_id>/payments/",
         views.PaymentView.as_view(),
@@ -50,5 +54,17 @@ urlpatterns = [
         name="admin-reset-password",
     ),
     path("dashboard/stream/", dashboard_sse, name="dashboard-sse"),
+    path(
+        "dashboard/stream/stats/",
+        views.DashboardStreamStatsView.as_view(),
+        name="dashboard-stream-stats",
+    ),
+    path("dashboard/heatmap/", views.SalesHeatmapView.as_view(), name="sales-heatmap"),
+    path(
+        "dashboard/heatmap/<int:branch_id>/",
+        views.SalesHeatmapView.as_view(),
+        name="sales-heatmap-branch",
+    ),
+    path("analytics/", views.AnalyticsView.as_view(), name="analytics"),
     path("test-rate-limit/", views.test_rate_limit, name="test-rate-limit"),
 ]
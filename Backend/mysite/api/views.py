@@ -15,12 +15,24 @@ from .views_dir.auth_view import CookieTokenObtainPairView, CookieTokenRefreshVi
 from .views_dir.branch_view import BranchViewClass
 from .views_dir.categorys_view import CategoryViewClass
 from .views_dir.customer_view import CustomerViewClass
-from .views_dir.invoice_view import InvoiceViewClass
-from .views_dir.dashboard_view import DashboardViewClass, ReportDashboardViewClass
+from .views_dir.invoice_view import (
+    InvoiceBatchViewClass,
+    InvoiceChangesViewClass,
+    InvoiceViewClass,
+)
+from .views_dir.dashboard_view import (
+    DashboardViewClass,
+    ReportDashboardViewClass,
+    SalesHeatmapViewClass,
+)
 from .views_dir.staff_view import StaffReportViewClass
 from .views_dir.payment_view import PaymentClassView
 from .views_dir.kitchentype_view import KitchenViewClass
 from .views_dir.notification_view import NotificationViewClass
+from .views_dir.kitchen_ticket_view import KitchenTicketViewClass
+from .views_dir.export_view import ExportViewClass
+from .views_dir.analytics_view import AnalyticsViewClass
+from .views_dir.sse_views import DashboardStreamStatsViewClass
 
 # custom
 from .views_dir.product_view import ProductViewClass
@@ -128,11 +140,18 @@ CategoryView = CategoryViewClass
 BranchView = BranchViewClass
 CustomerView = CustomerViewClass
 InvoiceView = InvoiceViewClass
+InvoiceBatchView = InvoiceBatchViewClass
+InvoiceChangesView = InvoiceChangesViewClass
+KitchenTicketView = KitchenTicketViewClass
 PaymentView = PaymentClassView
+ExportView = ExportViewClass
 FloorView = floor_view.FloorViewClass
 ItemActivityView = item_activity_view.ItemActivityClassView
 DashboardView = DashboardViewClass
 ReportDashboardView = ReportDashboardViewClass
+SalesHeatmapView = SalesHeatmapViewClass
+DashboardStreamStatsView = DashboardStreamStatsViewClass
 StaffReportView = StaffReportViewClass
+AnalyticsView = AnalyticsViewClass
 KitchenView = KitchenViewClass
 
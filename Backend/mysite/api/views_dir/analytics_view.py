@@ -0,0 +1,179 @@
+from datetime import date
+
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from ..analytics import NO_CODE, SalesFacts, day_dates
+from ..models import Product, ProductCategory
+
+WEEKDAYS = ["Mon", "Tue", "Wed", "Thu", "Fri", "Sat", "Sun"]
+PERCENTILES = (25, 50, 75, 90, 99)
+TOP_PRODUCTS = 10
+# Longest range one request may load; facts are cached per month
+MAX_RANGE_DAYS = 366 * 3
+
+
+def _names(model, codes):
+    names = dict(model.objects.filter(id__in=[int(code) for code in codes]).values_list("id", "name"))
+    return [names.get(int(code), "Unknown" if code == NO_CODE else str(code)) for code in codes]
+
+
+def product_mix(facts):
+    codes, lines, quantities = facts.group_by("items", "product", "quantity")
+    _, _, cents = facts.group_by("items", "product", "cents")
+    rows = [
+        {
+            "product_id": None if code == NO_CODE else int(code),
+            "product_name": name,
+            "lines": int(line_count),
+            "quantity": int(quantity),
+            "total_sales": int(total) / 100,
+        }
+        for code, name, line_count, quantity, total in zip(
+            codes, _names(Product, codes), lines, quantities, cents
+        )
+    ]
+    return sorted(rows, key=lambda row: row["total_sales"], reverse=True)
+
+
+def category_mix(facts):
+    codes, _, quantities = facts.group_by("items", "category", "quantity")
+    _, _, cents = facts.group_by("items", "category", "cents")
+    total_sales = int(cents.sum()) or 1
+    rows = [
+        {
+            "category_id": None if code == NO_CODE else int(code),
+            "category_name": name,
+            "quantity": int(quantity),
+            "total_sales": int(total) / 100,
+            "share_percent": int(total) * 100 / total_sales,
+        }
+        for code, name, quantity, total in zip(
+            codes, _names(ProductCategory, codes), quantities, cents
+        )
+    ]
+    return sorted(rows, key=lambda row: row["total_sales"], reverse=True)
+
+
+def heatmap(facts):
+    _, hours, orders = facts.pivot("invoices", "weekday", "hour")
+    _, _, cents = facts.pivot("invoices", "weekday", "hour", "cents")
+    return {
+        "weekdays": WEEKDAYS,
+        "hours": hours.tolist(),
+        "orders": orders.tolist(),
+        "sales": (cents / 100).tolist(),
+    }
+
+
+def product_by_day(facts):
+    products, days, quantities = facts.pivot("items", "product", "day", "quantity")
+    top = quantities.sum(axis=1).argsort()[::-1][:TOP_PRODUCTS]
+    return {
+        "days": day_dates(days),
+        "products": [
+            {
+                "product_id": None if products[i] == NO_CODE else int(products[i]),
+                "product_name": name,
+                "quantity": quantities[i].tolist(),
+            }
+            for i, name in zip(top, _names(Product, products[top]))
+        ],
+    }
+
+
+def order_value(facts):
+    cents = facts.tables["invoices"]["cents"]
+    values = facts.percentiles("invoices", "cents", PERCENTILES)
+    return {
+        "orders": len(cents),
+        "average": float(cents.mean()) / 100 if len(cents) else 0.0,
+        "percentiles": {f"p{q}": float(value) / 100 for q, value in zip(PERCENTILES, values)},
+    }
+
+
+ANALYTICS_QUERIES = {
+    "product_mix": product_mix,
+    "category_mix": category_mix,
+    "heatmap": heatmap,
+    "product_by_day": product_by_day,
+    "order_value": order_value,
+}
+
+
+class AnalyticsViewClass(APIView):
+    """
+    Sales history analytics computed on cached NumPy facts.
+    GET /api/analytics/?query=<product_mix|category_mix|heatmap|product_by_day|order_value>
+        &branch=&start_date=&end_date=
+    The range defaults to the current month and spans at most
+    MAX_RANGE_DAYS.
+    """
+
+    def get_user_role(self, user):
+        return "SUPER_ADMIN" if user.is_superuser else getattr(user, "user_type", "")
+
+    def get(self, request):
+        role = self.get_user_role(request.user)
+        if role not in ["ADMIN", "SUPER_ADMIN", "BRANCH_MANAGER"]:
+            return Response(
+                {"success": False, "error": "Permission denied"},
+                status=status.HTTP_403_FORBIDDEN,
+            )
+
+        query = request.query_params.get("query", "product_mix")
+        if query not in ANALYTICS_QUERIES:
+            return Response(
+                {"success": False, "error": f"query must be one of {', '.join(ANALYTICS_QUERIES)}"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        today = timezone.localdate()
+        try:
+            start_date = request.query_params.get("start_date")
+            end_date = request.query_params.get("end_date")
+            start_date = date.fromisoformat(start_date) if start_date else today.replace(day=1)
+            end_date = date.fromisoformat(end_date) if end_date else today
+        except ValueError:
+            return Response(
+                {"success": False, "error": "Dates must be in YYYY-MM-DD format"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        if start_date > end_date:
+            return Response(
+                {"success": False, "error": "start_date must not be after end_date"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        if (end_date - start_date).days >= MAX_RANGE_DAYS:
+            return Response(
+                {"success": False, "error": f"The range must not exceed {MAX_RANGE_DAYS} days"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        if role == "BRANCH_MANAGER":
+            branch_id = request.user.branch_id
+            if branch_id is None:
+                return Response(
+                    {"success": False, "error": "No branch assigned"},
+                    status=status.HTTP_403_FORBIDDEN,
+                )
+        else:
+            branch_id = request.query_params.get("branch") or None
+            if branch_id is not None and not branch_id.isdigit():
+                return Response(
+                    {"success": False, "error": "Invalid branch"},
+                    status=status.HTTP_400_BAD_REQUEST,
+                )
+
+        facts = SalesFacts.load(branch_id and int(branch_id), start_date, end_date)
+        return Response(
+            {
+                "success": True,
+                "query": query,
+                "start_date": start_date,
+                "end_date": end_date,
+                "data": ANALYTICS_QUERIES[query](facts),
+            }
+        )
@@ -1,23 +1,39 @@
+import math
 from datetime import date, datetime, time, timedelta
 from decimal import Decimal
 
 from dateutil.relativedelta import relativedelta
-from django.db.models import Count, DecimalField, ExpressionWrapper, F, Max, Q, Sum, Value
+from django.db.models import DecimalField, Sum, Value
 from django.db.models.functions import (
     Coalesce,
-    ExtractHour,
+    ExtractIsoWeekDay,
     ExtractWeek,
-    ExtractWeekDay,
     ExtractYear,
-    TruncHour,
 )
 from django.utils import timezone
 from rest_framework import status
 from rest_framework.response import Response
 from rest_framework.views import APIView
 
-from ..models import Branch, Invoice, InvoiceItem, User, Payment
-from ..serializer_dir.invoice_serializer import InvoiceResponseSerializer
+from ..dashboard_cache import cached_report
+from ..rollups import period_filter
+from ..models import (
+    Branch,
+    Invoice,
+    SalesHourRollup,
+    SalesPaymentRollup,
+    SalesProductRollup,
+    SalesStatusRollup,
+    User,
+)
+from ..serializer_dir.invoice_serializer import (
+    InvoiceResponseSerializer,
+    invoice_read_queryset,
+)
+
+
+# Reports kept precomputed by the precompute_dashboards command
+STANDARD_TIMEFRAMES = ("daily", "weekly", "monthly", "yearly")
 
 
 def get_date_range(request):
@@ -52,6 +68,11 @@ def get_date_range(request):
             except ValueError:
                 pass
 
+    return timeframe_range(timeframe, today)
+
+
+def timeframe_range(timeframe, today):
+    """(start_date, end_date, timeframe) of a standard timeframe ending today."""
     if timeframe == "daily":
         return today, today, "daily"
     elif timeframe == "weekly":
@@ -108,184 +129,265 @@ class DashboardViewClass(APIView):
 
         # Get base report data from the generalized function
         report_data = report_dashboard(target_branch, request)
-        start_date = report_data["start_date"]
-        end_date = report_data["end_date"]
-
-        # Base filter for extra aggregations
-        base_filter = {"created_at__date__gte": start_date, "created_at__date__lte": end_date}
-        if target_branch:
-            base_filter["branch"] = target_branch
-
-        # Common extra dashboard data
-        recent_orders_objs = (
-            Invoice.objects.filter(**base_filter)
-            .select_related("branch", "created_by")
-            .prefetch_related("bills", "bills__product", "payments")
-            .order_by("-created_at")[:5]
-        )
-        recent_orders = InvoiceResponseSerializer(recent_orders_objs, many=True).data
+        return Response(dashboard_data(target_branch, report_data), status=status.HTTP_200_OK)
+
+
+def dashboard_data(target_branch, report_data):
+    """
+    The dashboard of the overview page and of its SSE stream: a report
+    from report_for_range() plus recent orders, counts and the top branches.
+    """
+    start_date = report_data["start_date"]
+    end_date = report_data["end_date"]
+
+    # Base filter for extra aggregations
+    base_filter = {"business_date__gte": start_date, "business_date__lte": end_date}
+    if target_branch:
+        base_filter["branch"] = target_branch
+
+    # Common extra dashboard data
+    recent_orders_objs = (
+        invoice_read_queryset(Invoice.objects.filter(**base_filter))
+        .order_by("-created_at")[:5]
+    )
+    recent_orders = InvoiceResponseSerializer(recent_orders_objs, many=True).data
 
-        user_count = (
-            User.objects.filter(branch=target_branch).count() 
-            if target_branch else User.objects.all().count() - 1
-        )
+    user_count = (
+        User.objects.filter(branch=target_branch).count() 
+        if target_branch else User.objects.all().count() - 1
+    )
 
-        response_data = {
-            **report_data,
-            "recent_orders": recent_orders,
-            "total_sum": report_data["total_month_sales"],
-            "total_sales": report_data["total_month_sales"],
-            "total_count_order": report_data["total_month_orders"],
-            "total_orders": report_data["total_month_orders"],
-            "average_order_value": report_data["avg_order"],
-            "avg_orders": report_data["avg_order"],
-            "total_sales_per_category": report_data["sales_by_category"],
-            "sales_percent": report_data["growth_percent"],
-            "order_percent": report_data["growth_percent"],
-            "avg_order_percent": report_data["growth_percent"],
-            "total_user": user_count,
-            "total_user_count": user_count,
-            "total_branch": Branch.objects.all().count(),
-            "total_count_branch": Branch.objects.all().count(),
-        }
+    response_data = {
+        **report_data,
+        "recent_orders": recent_orders,
+        "total_sum": report_data["total_month_sales"],
+        "total_sales": report_data["total_month_sales"],
+        "total_count_order": report_data["total_month_orders"],
+        "total_orders": report_data["total_month_orders"],
+        "average_order_value": report_data["avg_order"],
+        "avg_orders": report_data["avg_order"],
+        "total_sales_per_category": report_data["sales_by_category"],
+        "sales_percent": report_data["growth_percent"],
+        "order_percent": report_data["growth_percent"],
+        "avg_order_percent": report_data["growth_percent"],
+        "total_user": user_count,
+        "total_user_count": user_count,
+        "total_branch": Branch.objects.all().count(),
+        "total_count_branch": Branch.objects.all().count(),
+    }
 
-        if not target_branch:
-            # Add global-only fields
-            response_data.update({
-                "top_perfomance_branch": list(Branch.objects.annotate(
-                    total_sales_per_branch=Coalesce(
-                        Sum("invoices__total_amount", filter=Q(invoices__created_at__date__gte=start_date, invoices__created_at__date__lte=end_date)),
-                        Value(0.0, output_field=DecimalField())
-                    )
-                ).values("name", "total_sales_per_branch").order_by("-total_sales_per_branch")[:5]),
-                "top_selling_items": report_data["top_selling_items_count"],
-            })
-        else:
-            # Add branch-specific fields
-            response_data.update({
-                "today_sales": report_data["total_month_sales"],
-                "top_selling_items": report_data["top_selling_items_count"],
-            })
-            
-            # Peak hours for single day
-            if (end_date - start_date).days == 0:
-                hourly_orders = (
-                    Invoice.objects.filter(**base_filter)
-                    .annotate(hour=TruncHour("created_at"))
-                    .values("hour")
-                    .annotate(total_orders=Count("id"))
+    if not target_branch:
+        # Add global-only fields
+        response_data.update({
+            "top_perfomance_branch": list(Branch.objects.annotate(
+                total_sales_per_branch=Coalesce(
+                    Sum("sales_status_rollups__total_amount", filter=period_filter(start_date, end_date, "sales_status_rollups__")),
+                    Value(0.0, output_field=DecimalField())
                 )
-                max_orders = hourly_orders.aggregate(max_orders=Max("total_orders"))["max_orders"]
-                if max_orders is not None:
-                    peak_hours = hourly_orders.filter(total_orders=max_orders)
-                    response_data["peak_hours"] = [h["hour"].strftime("%I:%M %p") for h in peak_hours]
-
-        return Response(response_data, status=status.HTTP_200_OK)
+            ).values("name", "total_sales_per_branch").order_by("-total_sales_per_branch")[:5]),
+            "top_selling_items": report_data["top_selling_items_count"],
+        })
+    else:
+        # Add branch-specific fields
+        response_data.update({
+            "today_sales": report_data["total_month_sales"],
+            "top_selling_items": report_data["top_selling_items_count"],
+        })
+        
+        # Peak hours for single day
+        if (end_date - start_date).days == 0:
+            busiest = peak_hours(target_branch, start_date)
+            if busiest:
+                response_data["peak_hours"] = busiest
+
+    return response_data
+
+
+def peak_hours(branch, day):
+    """Hours of a business day with the most orders, from the hour rollup."""
+    hourly_orders = list(
+        SalesHourRollup.objects.filter(branch=branch, business_date=day)
+        .values("hour")
+        .annotate(total_orders=Sum("invoice_count"))
+        .order_by("hour")
+    )
+    if not hourly_orders:
+        return []
+    max_orders = max(h["total_orders"] for h in hourly_orders)
+    return [
+        time(h["hour"]).strftime("%I:%M %p")
+        for h in hourly_orders
+        if h["total_orders"] == max_orders
+    ]
+
+
+def _ranked(rows, key, total_field="total_amount"):
+    """Sum rollup rows per `key` value, largest total first."""
+    totals = {}
+    for row in rows:
+        totals[row[key]] = totals.get(row[key], 0) + row["total_amount"]
+    return [
+        {key: value, total_field: total}
+        for value, total in sorted(totals.items(), key=lambda item: item[1], reverse=True)
+    ]
 
 
 def report_dashboard(my_branch=None, request=None):
+    """
+    Dashboard figures for a branch (or all branches) over the period
+    requested, served from the versioned dashboard cache.
+    """
     start_date, end_date, timeframe = get_date_range(request)
-
-    base_filter = {
-        "created_at__date__gte": start_date,
-        "created_at__date__lte": end_date,
-    }
-    if my_branch:
-        base_filter["branch"] = my_branch
-
-    current_sales = (
-        Invoice.objects.filter(**base_filter).aggregate(total_sales_amount=Sum("total_amount"))["total_sales_amount"]
-        or 0
+    return report_for_range(my_branch, start_date, end_date, timeframe)
+
+
+def report_for_range(my_branch, start_date, end_date, timeframe):
+    """report_dashboard() for an already resolved period."""
+    branch_id = getattr(my_branch, "pk", my_branch)
+    return cached_report(
+        branch_id,
+        timeframe,
+        start_date,
+        end_date,
+        lambda: build_report_dashboard(my_branch, start_date, end_date, timeframe),
     )
 
-    # total orders
-    current_orders_qs = Invoice.objects.filter(**base_filter)
-    current_orders_count = current_orders_qs.count()
 
-    # average order
-    avg_order = current_sales / current_orders_count if current_orders_count > 0 else 0
+def build_report_dashboard(my_branch, start_date, end_date, timeframe):
+    """
+    Compute the dashboard figures from the sales rollup tables only.
+
+    Four queries in total: invoice totals per payment status for this and
+    the previous period (conditional aggregates), the sales trend, one pass
+    over product rollups split into category/kitchen/top-selling in Python,
+    and the payment method breakdown. Totals read whole months and weeks
+    from their MONTH/WEEK rollup rows and only the edges of the range from
+    DAY rows, so a yearly report sums a few dozen rows per dimension.
+    """
+    branch_filter = {"branch": my_branch} if my_branch else {}
 
     # growth percent comparison (compare with previous period of same length)
     period_length = (end_date - start_date).days + 1
     prev_end_date = start_date - timedelta(days=1)
     prev_start_date = prev_end_date - timedelta(days=period_length - 1)
 
-    prev_base_filter = {
-        "created_at__date__gte": prev_start_date,
-        "created_at__date__lte": prev_end_date,
-    }
-    if my_branch:
-        prev_base_filter["branch"] = my_branch
-
-    prev_period_sales = (
-        Invoice.objects.filter(**prev_base_filter).aggregate(total_sales=Sum("total_amount"))["total_sales"]
-        or 0
+    # Whole months and weeks are read from their own rollup rows
+    current_period = period_filter(start_date, end_date)
+    previous_period = period_filter(prev_start_date, prev_end_date)
+
+    by_status = list(
+        SalesStatusRollup.objects.filter(current_period | previous_period, **branch_filter)
+        .values("payment_status")
+        .annotate(
+            sales=Coalesce(
+                Sum("total_amount", filter=current_period),
+                Value(0.0, output_field=DecimalField()),
+            ),
+            orders=Coalesce(Sum("invoice_count", filter=current_period), 0),
+            prev_sales=Coalesce(
+                Sum("total_amount", filter=previous_period),
+                Value(0.0, output_field=DecimalField()),
+            ),
+        )
+        .order_by("-sales")
     )
+    current_sales = sum(row["sales"] for row in by_status)
+    current_orders_count = sum(row["orders"] for row in by_status)
+    prev_period_sales = sum(row["prev_sales"] for row in by_status)
+    sales_by_status = [
+        {"payment_status": row["payment_status"], "total_amount": row["sales"]}
+        for row in by_status
+        if row["orders"]
+    ]
+
+    # average order
+    avg_order = current_sales / current_orders_count if current_orders_count > 0 else 0
 
     if prev_period_sales == 0:
         growth_percent = current_sales - prev_period_sales
     else:
         growth_percent = ((current_sales - prev_period_sales) / prev_period_sales) * 100
 
-    # Trend Data
-    trend_data = (
-        Invoice.objects.filter(**base_filter)
+    # Sales per business day (and hour for a single day), shared by the
+    # weekly bars and the trend chart
+    single_day = timeframe == "daily" or period_length <= 1
+    days_filter = {**branch_filter, "business_date__gte": start_date, "business_date__lte": end_date}
+    if single_day:
+        trend_fields = ["business_date", "hour"]
+        trend_rollups = SalesHourRollup.objects.filter(**days_filter)
+    else:
+        trend_fields = ["business_date"]
+        trend_rollups = SalesStatusRollup.objects.filter(period="DAY", **days_filter)
+    trend_rows = list(
+        trend_rollups.values(*trend_fields)
+        .annotate(sales=Sum("total_amount"))
+        .order_by(*trend_fields)
     )
+    daily_sales = {}
+    for item in trend_rows:
+        day = item["business_date"]
+        daily_sales[day] = daily_sales.get(day, 0) + item["sales"]
 
     # Weekly Sales (Specific format for frontend bars)
     today = date.today() # Ensure 'today' is defined for this scope
     start_of_current_week = today - timedelta(days=today.weekday())
-    weekly_qs = trend_data.filter(created_at__date__gte=start_of_current_week).annotate(label=ExtractWeekDay("created_at")).values("label").annotate(sales=Sum("total_amount"))
-    day_names_full = {1: "sunday", 2: "monday", 3: "tuesday", 4: "wednesday", 5: "thursday", 6: "friday", 7: "saturday"}
-    weekly_sales_dict = {name: 0.0 for name in day_names_full.values()}
-    for item in weekly_qs:
-        weekly_sales_dict[day_names_full[item["label"]]] = float(item["sales"])
+    day_names_full = ["monday", "tuesday", "wednesday", "thursday", "friday", "saturday", "sunday"]
+    weekly_sales_dict = {name: 0.0 for name in day_names_full[-1:] + day_names_full[:-1]}
+    for day, sales in daily_sales.items():
+        if day >= start_of_current_week:
+            weekly_sales_dict[day_names_full[day.weekday()]] += float(sales)
 
-    if timeframe == "daily" or period_length <= 1:
+    if single_day:
         # Show hourly trend for single day or daily view
-        trend_qs = trend_data.annotate(label=ExtractHour("created_at")).values("label").annotate(sales=Sum("total_amount")).order_by("label")
+        sales_by_hour = {item["hour"]: item["sales"] for item in trend_rows}
         trend_chart = []
         for h in range(8, 21):
             lbl = f"{h if h <= 12 else h - 12} {'AM' if h < 12 else 'PM'}"
-            val = next((item["sales"] for item in trend_qs if item["label"] == h), 0)
-            trend_chart.append({"label": lbl, "sales": float(val)})
+            trend_chart.append({"label": lbl, "sales": float(sales_by_hour.get(h, 0))})
     elif timeframe == "weekly" or period_length <= 7:
         # Show daily trend for the week
-        trend_qs = trend_data.annotate(label=ExtractWeekDay("created_at")).values("label").annotate(sales=Sum("total_amount")).order_by("label")
-        day_names = {1: "Sun", 2: "Mon", 3: "Tue", 4: "Wed", 5: "Thu", 6: "Fri", 7: "Sat"}
-        trend_chart = []
-        for d_idx in [2, 3, 4, 5, 6, 7, 1]:
-            val = next((item["sales"] for item in trend_qs if item["label"] == d_idx), 0)
-            trend_chart.append({"label": day_names[d_idx], "sales": float(val)})
+        day_names = ["Mon", "Tue", "Wed", "Thu", "Fri", "Sat", "Sun"]
+        sales_by_weekday = [0.0] * 7
+        for day, sales in daily_sales.items():
+            sales_by_weekday[day.weekday()] += float(sales)
+        trend_chart = [
+            {"label": name, "sales": sales} for name, sales in zip(day_names, sales_by_weekday)
+        ]
     else:
         # Show daily trend for the month/range
-        trend_qs = trend_data.annotate(label=F("created_at__date")).values("label").annotate(sales=Sum("total_amount")).order_by("label")
-        trend_chart = [{"label": item["label"].strftime("%d %b"), "sales": float(item["sales"])} for item in trend_qs]
-
-    # Aggregate distribution data
-    def get_distribution(model, period_filter, values_field, annotate_field="total_amount"):
-        return list(model.objects.filter(**period_filter).values(values_field).annotate(**{annotate_field: Coalesce(Sum(
-            ExpressionWrapper(
-                F("quantity") * F("unit_price") - F("discount_amount"),
-                output_field=DecimalField(max_digits=12, decimal_places=2),
-            ) if model == InvoiceItem else F("amount"),
-            output_field=DecimalField()
-        ), Value(0.0, output_field=DecimalField()))}).order_by(f"-{annotate_field}"))
-
-    period_filter_ii = {"invoice__created_at__date__gte": start_date, "invoice__created_at__date__lte": end_date}
-    if my_branch:
-        period_filter_ii["invoice__branch"] = my_branch
-    
-    period_filter_p = {"invoice__created_at__date__gte": start_date, "invoice__created_at__date__lte": end_date}
-    if my_branch:
-        period_filter_p["invoice__branch"] = my_branch
-
-    sales_by_category = get_distribution(InvoiceItem, period_filter_ii, "product__category__name", "category_total_sales")
-    sales_by_kitchen = get_distribution(InvoiceItem, period_filter_ii, "product__category__kitchentype__name")
-    sales_by_payment = get_distribution(Payment, period_filter_p, "payment_method")
-    sales_by_status = list(Invoice.objects.filter(**base_filter).values("payment_status").annotate(total_amount=Coalesce(Sum("total_amount"), Value(0.0, output_field=DecimalField()))).order_by("-total_amount"))
-
-    top_selling = list(InvoiceItem.objects.filter(**period_filter_ii).values("product__name").annotate(total_orders=Sum("quantity")).annotate(total_sales=Sum(ExpressionWrapper(F("quantity") * F("unit_price") - F("discount_amount"), output_field=DecimalField(max_digits=12, decimal_places=2)))).order_by("-total_orders")[:5])
+        trend_chart = [{"label": day.strftime("%d %b"), "sales": float(sales)} for day, sales in daily_sales.items()]
+
+    # One grouped pass over product rollups for every item-level breakdown
+    product_rows = list(
+        SalesProductRollup.objects.filter(current_period, **branch_filter)
+        .values(
+            "product_id",
+            "product__name",
+            "product__category__name",
+            "product__category__kitchentype__name",
+        )
+        .annotate(quantity=Sum("quantity"), total_amount=Sum("total_amount"))
+        .order_by()
+    )
+    sales_by_category = _ranked(product_rows, "product__category__name", "category_total_sales")
+    sales_by_kitchen = _ranked(product_rows, "product__category__kitchentype__name")
+
+    top_selling = {}
+    for row in product_rows:
+        item = top_selling.setdefault(
+            row["product__name"],
+            {"product__name": row["product__name"], "total_orders": 0, "total_sales": 0},
+        )
+        item["total_orders"] += row["quantity"]
+        item["total_sales"] += row["total_amount"]
+    top_selling = sorted(top_selling.values(), key=lambda item: item["total_orders"], reverse=True)[:5]
+
+    sales_by_payment = list(
+        SalesPaymentRollup.objects.filter(current_period, **branch_filter)
+        .values("payment_method")
+        .annotate(total_amount=Coalesce(Sum("amount"), Value(0.0, output_field=DecimalField())))
+        .order_by("-total_amount")
+    )
 
     return {
         "success": True,
@@ -333,3 +435,136 @@ class ReportDashboardViewClass(APIView):
 
         data = report_dashboard(my_branch, request)
         return Response({"success": True, **data}, status=status.HTTP_200_OK)
+
+
+WEEKDAY_LABELS = ["Mon", "Tue", "Wed", "Thu", "Fri", "Sat", "Sun"]
+
+
+def _weekday_counts(start_date, end_date):
+    """How many times each weekday (Monday first) occurs in the range."""
+    days = (end_date - start_date).days + 1
+    counts = [days // 7] * 7
+    for offset in range(days % 7):
+        counts[(start_date.weekday() + offset) % 7] += 1
+    return counts
+
+
+def build_sales_heatmap(my_branch, start_date, end_date):
+    """
+    Orders and sales per (weekday, hour) cell over the range, and the
+    expected orders of each cell on an average day, from the hour rollup.
+    One grouped query over at most 24 rows per day whatever the range.
+    """
+    filters = {"business_date__gte": start_date, "business_date__lte": end_date}
+    if my_branch:
+        filters["branch"] = my_branch
+
+    orders = [[0] * 24 for _ in range(7)]
+    sales = [[0.0] * 24 for _ in range(7)]
+    for row in (
+        SalesHourRollup.objects.filter(**filters)
+        .annotate(weekday=ExtractIsoWeekDay("business_date"))
+        .values("weekday", "hour")
+        .annotate(orders=Sum("invoice_count"), sales=Sum("total_amount"))
+        .order_by()
+    ):
+        orders[row["weekday"] - 1][row["hour"]] = row["orders"]
+        sales[row["weekday"] - 1][row["hour"]] = float(row["sales"])
+
+    weekday_counts = _weekday_counts(start_date, end_date)
+    days = max(sum(weekday_counts), 1)
+    expected_orders = [
+        [round(cell / count, 2) if count else 0.0 for cell in row]
+        for row, count in zip(orders, weekday_counts)
+    ]
+    # Orders per hour on an average day of the range, for shift planning
+    expected_orders_per_hour = [
+        round(sum(row[hour] for row in orders) / days, 2) for hour in range(24)
+    ]
+
+    busiest = max(
+        ((weekday, hour) for weekday in range(7) for hour in range(24)),
+        key=lambda cell: orders[cell[0]][cell[1]],
+    )
+    peak = None
+    # An empty range has no busiest cell
+    if orders[busiest[0]][busiest[1]]:
+        peak = {
+            "weekday": WEEKDAY_LABELS[busiest[0]],
+            "hour": time(busiest[1]).strftime("%I:%M %p"),
+            "orders": orders[busiest[0]][busiest[1]],
+        }
+    return {
+        "success": True,
+        "start_date": start_date,
+        "end_date": end_date,
+        "weekdays": WEEKDAY_LABELS,
+        "hours": list(range(24)),
+        "orders": orders,
+        "sales": sales,
+        "expected_orders": expected_orders,
+        "expected_orders_per_hour": expected_orders_per_hour,
+        "peak": peak,
+    }
+
+
+class SalesHeatmapViewClass(APIView):
+    """
+    Weekday x hour order heatmap and staffing curve over any range.
+    GET /api/dashboard/heatmap/[<branch_id>/]?timeframe=|start_date=&end_date=
+        [&orders_per_staff=N]
+    With orders_per_staff, staff_needed gives the staff to schedule per
+    cell for the expected orders.
+    """
+
+    def get_user_role(self, user):
+        return "SUPER_ADMIN" if user.is_superuser else getattr(user, "user_type", "")
+
+    def get(self, request, branch_id=None):
+        role = self.get_user_role(request.user)
+        my_branch = getattr(request.user, "branch", None)
+
+        if role not in ["SUPER_ADMIN", "ADMIN", "BRANCH_MANAGER"]:
+            return Response(
+                {"success": False, "message": "Insufficient permissions"},
+                status=status.HTTP_403_FORBIDDEN,
+            )
+
+        target_branch = None
+        if role in ["SUPER_ADMIN", "ADMIN"]:
+            target_branch = branch_id
+        elif my_branch:
+            target_branch = my_branch.pk
+        else:
+            return Response(
+                {"success": False, "message": "No branch assigned"},
+                status=status.HTTP_403_FORBIDDEN,
+            )
+
+        orders_per_staff = request.query_params.get("orders_per_staff")
+        if orders_per_staff is not None:
+            try:
+                orders_per_staff = float(orders_per_staff)
+                if orders_per_staff <= 0:
+                    raise ValueError
+            except ValueError:
+                return Response(
+                    {"success": False, "message": "orders_per_staff must be a positive number"},
+                    status=status.HTTP_400_BAD_REQUEST,
+                )
+
+        start_date, end_date, timeframe = get_date_range(request)
+        data = cached_report(
+            target_branch,
+            f"heatmap-{timeframe}",
+            start_date,
+            end_date,
+            lambda: build_sales_heatmap(target_branch, start_date, end_date),
+        )
+        data = {**data, "timeframe": timeframe}
+        if orders_per_staff:
+            data["staff_needed"] = [
+                [math.ceil(cell / orders_per_staff) for cell in row]
+                for row in data["expected_orders"]
+            ]
+        return Response(data, status=status.HTTP_200_OK)
@@ -0,0 +1,95 @@
+from datetime import date
+
+from django.http import StreamingHttpResponse
+from rest_framework import status
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from ..exports import EXPORT_COLUMNS, aiter_chunks, csv_chunks, export_queryset, xlsx_chunks
+
+EXPORT_FORMATS = {
+    "csv": (csv_chunks, "text/csv; charset=utf-8"),
+    "xlsx": (
+        xlsx_chunks,
+        "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+    ),
+}
+
+
+class ExportViewClass(APIView):
+    """
+    Streaming spreadsheet export of invoices, items or payments.
+    GET /api/export/<invoices|items|payments>/?file_type=csv|xlsx
+        &branch=&start_date=&end_date=&payment_method=
+    Rows are read in chunks and written out as they arrive, so memory use
+    does not grow with the date range.
+    """
+
+    def get_user_role(self, user):
+        return "SUPER_ADMIN" if user.is_superuser else getattr(user, "user_type", "")
+
+    def get(self, request, kind):
+        role = self.get_user_role(request.user)
+        if role not in ["ADMIN", "SUPER_ADMIN", "BRANCH_MANAGER"]:
+            return Response(
+                {"success": False, "error": "Permission denied"},
+                status=status.HTTP_403_FORBIDDEN,
+            )
+        if kind not in EXPORT_COLUMNS:
+            return Response(
+                {"success": False, "error": f"Unknown export '{kind}'"},
+                status=status.HTTP_404_NOT_FOUND,
+            )
+
+        file_type = request.query_params.get("file_type", "csv").lower()
+        if file_type not in EXPORT_FORMATS:
+            return Response(
+                {"success": False, "error": "file_type must be csv or xlsx"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        try:
+            start_date = request.query_params.get("start_date")
+            end_date = request.query_params.get("end_date")
+            start_date = date.fromisoformat(start_date) if start_date else None
+            end_date = date.fromisoformat(end_date) if end_date else None
+        except ValueError:
+            return Response(
+                {"success": False, "error": "Dates must be in YYYY-MM-DD format"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        if role == "BRANCH_MANAGER":
+            branch_id = request.user.branch_id
+            if branch_id is None:
+                return Response(
+                    {"success": False, "error": "No branch assigned"},
+                    status=status.HTTP_403_FORBIDDEN,
+                )
+        else:
+            branch_id = request.query_params.get("branch") or None
+            if branch_id is not None and not branch_id.isdigit():
+                return Response(
+                    {"success": False, "error": "Invalid branch"},
+                    status=status.HTTP_400_BAD_REQUEST,
+                )
+
+        payment_method = request.query_params.get("payment_method")
+        rows = export_queryset(
+            kind,
+            branch_id=branch_id,
+            start_date=start_date,
+            end_date=end_date,
+            payment_method=payment_method.strip().upper() if payment_method else None,
+        )
+
+        write_chunks, content_type = EXPORT_FORMATS[file_type]
+        chunks = write_chunks(kind, rows)
+        # Only ASGI requests carry a connection scope
+        if hasattr(request, "scope"):
+            chunks = aiter_chunks(chunks)
+        response = StreamingHttpResponse(chunks, content_type=content_type)
+        filename = "_".join(str(part) for part in (kind, start_date, end_date) if part)
+        response["Content-Disposition"] = f'attachment; filename="{filename}.{file_type}"'
+        response["X-Accel-Buffering"] = "no"
+        return response
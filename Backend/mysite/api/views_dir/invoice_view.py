@@ -1,17 +1,98 @@
-from datetime import date
+import logging
+from datetime import date, timedelta
 
-from asgiref.sync import async_to_sync
-from channels.layers import get_channel_layer
-from django.db import transaction
+from django.db import connection, transaction
+from django.utils import timezone
 from rest_framework import status
 from rest_framework.response import Response
 from rest_framework.views import APIView
 
-from ..models import Invoice
+from ..events import publish_invoice_event
+from ..idempotency import idempotent
+from ..models import Invoice, InvoiceTombstone, KitchenTicket
+from ..pagination import (
+    InvalidCursor,
+    decode_watermark,
+    encode_watermark,
+    get_page_size,
+    keyset_page,
+)
 from ..serializer_dir.invoice_serializer import (
     InvoiceResponseSerializer,
     InvoiceSerializer,
+    broadcast_invoices_created,
+    create_invoices,
+    invoice_read_queryset,
+    prefetch_invoice_relations,
 )
+from .signals import TOMBSTONE_RETENTION
+
+logger = logging.getLogger(__name__)
+
+MAX_BATCH_ORDERS = 500
+# Overlap re-sent on every delta sync, covering clock skew between the
+# app servers and the database
+SYNC_OVERLAP = timedelta(seconds=5)
+# Furthest the watermark falls behind the clock. A transaction open for
+# longer is taken as leaked (a forgotten psql shell, a stuck worker)
+# rather than letting it hold every client's sync window open.
+MAX_WATERMARK_LAG = timedelta(minutes=5)
+# (pid, xact_start) of the transactions already reported as over the lag
+_lagging_transactions = set()
+
+
+def sync_watermark(now):
+    """
+    Watermark of a delta sync read now: the start of the oldest transaction
+    still open, or `now` when there is none.
+
+    updated_at is stamped when a row is saved, not when its transaction
+    commits, so a long transaction (a large batch, or a create waiting on
+    the invoice sequence lock) can commit rows stamped well before `now`.
+    Every row stamped before an open transaction started is already
+    committed, so nothing below this watermark can still appear. It never
+    lags more than MAX_WATERMARK_LAG behind `now`.
+    """
+    if connection.vendor != "postgresql":
+        return now
+    with connection.cursor() as cursor:
+        cursor.execute(
+            """
+            SELECT pid, xact_start, state FROM pg_stat_activity
+            WHERE datname = current_database()
+              AND backend_type = 'client backend'
+              AND pid <> pg_backend_pid()
+              AND xact_start IS NOT NULL
+            ORDER BY xact_start
+            LIMIT 1
+            """
+        )
+        oldest = cursor.fetchone()
+    if oldest is None:
+        return now
+
+    pid, xact_start, state = oldest
+    if xact_start < now - MAX_WATERMARK_LAG:
+        if (pid, xact_start) not in _lagging_transactions:
+            _lagging_transactions.add((pid, xact_start))
+            logger.warning(
+                f"Delta sync watermark capped at {MAX_WATERMARK_LAG}: "
+                f"transaction of backend {pid} ({state}) open since {xact_start}"
+            )
+        return now - MAX_WATERMARK_LAG
+    return min(now, xact_start)
+
+
+def invoice_scope(role, my_branch, today_date):
+    """
+    Invoices a role can list, and whether cancelled ones are hidden from it.
+    Floor staff only see today's invoices of their branch.
+    """
+    if role in ["COUNTER", "WAITER", "KITCHEN"]:
+        return Invoice.objects.filter(branch=my_branch, business_date=today_date), True
+    elif role == "BRANCH_MANAGER":
+        return Invoice.objects.filter(branch=my_branch), False
+    return Invoice.objects.all(), False
 
 
 class InvoiceViewClass(APIView):
@@ -38,13 +119,13 @@ class InvoiceViewClass(APIView):
             try:
                 # Apply branch filter for non-admin users
                 if role not in ["ADMIN", "SUPER_ADMIN"] and my_branch:
-                    invoice = Invoice.objects.get(
-                        branch=my_branch, created_at__date=today_date, id=id
+                    invoice = invoice_read_queryset().get(
+                        branch=my_branch, business_date=today_date, id=id
                     )
                     serializer = InvoiceResponseSerializer(invoice)
                     return Response({"success": True, "data": serializer.data})
                 else:
-                    invoice = Invoice.objects.get(id=id)
+                    invoice = invoice_read_queryset().get(id=id)
                     serializer = InvoiceResponseSerializer(invoice)
                     return Response({"success": True, "data": serializer.data})
 
@@ -55,25 +136,44 @@ class InvoiceViewClass(APIView):
                 )
         else:
             # Base filtering
-            if role in ["COUNTER", "WAITER", "KITCHEN"]:
-                invoices = Invoice.objects.filter(
-                    branch=my_branch, created_at__date=today_date
-                ).exclude(payment_status__in=["CANCELLED"])
-            elif role == "BRANCH_MANAGER":
-                invoices = Invoice.objects.filter(branch=my_branch)
-            else:
-                invoices = Invoice.objects.all()
+            invoices, hide_cancelled = invoice_scope(role, my_branch, today_date)
+            if hide_cancelled:
+                invoices = invoices.exclude(payment_status__in=["CANCELLED"])
 
             # Filter by customer if provided
             customer_id = request.query_params.get("customer")
             if customer_id:
                 invoices = invoices.filter(customer_id=customer_id)
 
-            invoices = invoices.order_by("-created_at")
+            # Cursor pagination when the client asks for it, full list otherwise
+            if "cursor" in request.query_params or "page_size" in request.query_params:
+                try:
+                    page, next_cursor = keyset_page(
+                        invoice_read_queryset(invoices),
+                        cursor=request.query_params.get("cursor"),
+                        page_size=get_page_size(request.query_params),
+                    )
+                except InvalidCursor:
+                    return Response(
+                        {"success": False, "error": "Invalid cursor"},
+                        status=status.HTTP_400_BAD_REQUEST,
+                    )
+                serializer = InvoiceResponseSerializer(page, many=True)
+                return Response(
+                    {
+                        "success": True,
+                        "data": serializer.data,
+                        "next_cursor": next_cursor,
+                        "has_more": next_cursor is not None,
+                    }
+                )
+
+            invoices = invoice_read_queryset(invoices).order_by("-created_at")
             serializer = InvoiceResponseSerializer(invoices, many=True)
-            return Response({"success": True, "count": invoices.count(), "data": serializer.data})
+            return Response({"success": True, "count": len(serializer.data), "data": serializer.data})
 
     # ------------------ POST (Create) ------------------
+    @idempotent
     @transaction.atomic
     def post(self, request):
         """Create new invoice"""
@@ -122,7 +222,9 @@ class InvoiceViewClass(APIView):
             print("yy")
             try:
                 invoice = serializer.save()
-                response_serializer = InvoiceResponseSerializer(invoice)
+                response_serializer = InvoiceResponseSerializer(
+                    invoice_read_queryset().get(id=invoice.id)
+                )
                 return Response(
                     {"success": True, "data": response_serializer.data},
                     status=status.HTTP_201_CREATED,  # ✅ Use status constants
@@ -151,7 +253,7 @@ class InvoiceViewClass(APIView):
             filter_kwargs = {"id": id}
             if role not in ["ADMIN", "SUPER_ADMIN"] and my_branch:
                 filter_kwargs["branch"] = my_branch.id
-            invoice = Invoice.objects.get(**filter_kwargs)
+            invoice = invoice_read_queryset().get(**filter_kwargs)
         except Invoice.DoesNotExist:
             return Response(
                 {"success": False, "error": "Invoice not found"},
@@ -171,6 +273,30 @@ class InvoiceViewClass(APIView):
                 status=status.HTTP_400_BAD_REQUEST,
             )
 
+        # Line items are edited through InvoiceSerializer.update, which diffs
+        # them against the stored rows and moves stock by the difference
+        if "items" in request.data:
+            if invoice.payment_status == "PAID":
+                return Response(
+                    {"success": False, "error": "Cannot edit the items of a paid invoice"},
+                    status=status.HTTP_400_BAD_REQUEST,
+                )
+            item_serializer = InvoiceSerializer(
+                invoice,
+                data={"items": request.data["items"]},
+                partial=True,
+                context={"request": request, "branch": invoice.branch_id},
+            )
+            if not item_serializer.is_valid():
+                return Response(
+                    {"success": False, "errors": item_serializer.errors},
+                    status=status.HTTP_400_BAD_REQUEST,
+                )
+            item_serializer.save()
+            # Read the new items and totals back for the response
+            invoice = invoice_read_queryset().get(id=invoice.id)
+            publish_invoice_event({"type": "invoice_updated", "invoice_id": str(id)})
+
         # Only allow updating safe fields
         allowed_fields = ["notes", "description", "is_active", "invoice_status"]
         if role in ["ADMIN", "SUPER_ADMIN"]:
@@ -181,6 +307,9 @@ class InvoiceViewClass(APIView):
         serializer = InvoiceResponseSerializer(invoice, data=data, partial=True)
         if serializer.is_valid():
             serializer.save()
+            KitchenTicket.objects.filter(invoice=invoice).update(
+                status=invoice.invoice_status, description=invoice.description
+            )
 
             # Broadcast status update to all connected clients (kitchen, waiter, counter)
             new_status = data.get("invoice_status")
@@ -194,22 +323,13 @@ class InvoiceViewClass(APIView):
                         message=f"Order #{invoice.invoice_number or id} is ready! Prepared by {request.user.full_name or request.user.username}."
                     )
 
-                try:
-                    channel_layer = get_channel_layer()
-                    if channel_layer is not None:
-                        message = {
-                            "type": "invoice_updated",
-                            "invoice_id": str(id),
-                            "status": new_status,
-                        }
-                        # Notify kitchen screens
-                        async_to_sync(channel_layer.group_send)(
-                            "kitchen_orders", message
-                        )
-                        # Notify waiter/counter screens
-                        async_to_sync(channel_layer.group_send)("orders", message)
-                except Exception:
-                    pass
+                publish_invoice_event(
+                    {
+                        "type": "invoice_updated",
+                        "invoice_id": str(id),
+                        "status": new_status,
+                    }
+                )
 
             return Response({"success": True, "data": serializer.data})
 
@@ -256,3 +376,176 @@ class InvoiceViewClass(APIView):
                 {"success": False, "error": "Invoice not found"},
                 status=status.HTTP_404_NOT_FOUND,  # ✅ Use status constants
             )
+
+
+class InvoiceBatchViewClass(APIView):
+    """
+    Bulk ingest of orders queued offline by POS tablets.
+
+    Accepts {"orders": [...]} (or a bare list) of InvoiceSerializer payloads
+    for one branch. Orders are validated together, valid ones are created in
+    one transaction with bulk inserts, and a result is returned per order in
+    request order. Invalid orders do not block the valid ones.
+    """
+
+    def get_user_role(self, user):
+        return "SUPER_ADMIN" if user.is_superuser else getattr(user, "user_type", "")
+
+    @idempotent
+    def post(self, request):
+        role = self.get_user_role(request.user)
+        my_branch = getattr(request.user, "branch", None)
+
+        if role not in ["ADMIN", "SUPER_ADMIN", "COUNTER", "WAITER", "BRANCH_MANAGER"]:
+            return Response(
+                {"success": False, "error": "Permission denied"},
+                status=status.HTTP_403_FORBIDDEN,
+            )
+
+        orders = request.data.get("orders") if hasattr(request.data, "get") else request.data
+        if not isinstance(orders, list) or not orders:
+            return Response(
+                {"success": False, "message": "orders must be a non-empty list."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        if len(orders) > MAX_BATCH_ORDERS:
+            return Response(
+                {
+                    "success": False,
+                    "message": f"A batch can hold at most {MAX_BATCH_ORDERS} orders.",
+                },
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        # Same branch resolution as single invoice creation
+        branch_id = my_branch.id if my_branch else (
+            request.data.get("branch") if hasattr(request.data, "get") else None
+        )
+        if not branch_id:
+            return Response(
+                {
+                    "success": False,
+                    "message": "Branch is required to create invoices.",
+                },
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        # Every order in the batch is booked on the resolved branch
+        orders = [
+            {**order, "branch": branch_id} if isinstance(order, dict) else order
+            for order in orders
+        ]
+
+        context = {"request": request, "branch": branch_id}
+        prefetch_invoice_relations(orders, context)
+
+        results = [None] * len(orders)
+        valid_indexes = []
+        valid_orders = []
+        for index, order in enumerate(orders):
+            serializer = InvoiceSerializer(data=order, context=context)
+            if serializer.is_valid():
+                valid_indexes.append(index)
+                valid_orders.append(serializer.validated_data)
+            else:
+                results[index] = {
+                    "index": index,
+                    "success": False,
+                    "errors": serializer.errors,
+                }
+
+        invoices = []
+        if valid_orders:
+            try:
+                with transaction.atomic():
+                    invoices = create_invoices(
+                        valid_orders, request.user, int(branch_id)
+                    )
+            except Exception as e:
+                return Response(
+                    {"success": False, "error": str(e)},
+                    status=status.HTTP_400_BAD_REQUEST,
+                )
+
+        for index, invoice in zip(valid_indexes, invoices):
+            results[index] = {
+                "index": index,
+                "success": True,
+                "id": invoice.id,
+                "invoice_number": invoice.invoice_number,
+                "total_amount": invoice.total_amount,
+                "payment_status": invoice.payment_status,
+            }
+
+        broadcast_invoices_created(invoices)
+
+        return Response(
+            {
+                "success": bool(invoices),
+                "created": len(invoices),
+                "failed": len(orders) - len(invoices),
+                "results": results,
+            },
+            status=status.HTTP_201_CREATED if invoices else status.HTTP_400_BAD_REQUEST,
+        )
+
+
+class InvoiceChangesViewClass(APIView):
+    """
+    Delta sync for screens that keep a local invoice cache.
+
+    GET /api/invoice/changes/?since=<watermark> returns the invoices created
+    or updated since the watermark and the ids deleted since then, plus a new
+    watermark for the next call. Without `since` (or with one older than the
+    tombstone retention) it answers with a full snapshot and reset=true.
+    """
+
+    def get_user_role(self, user):
+        return "SUPER_ADMIN" if user.is_superuser else getattr(user, "user_type", "")
+
+    def get(self, request):
+        role = self.get_user_role(request.user)
+        my_branch = request.user.branch
+        now = timezone.now()
+        # Taken before reading, so rows committed meanwhile are sent again next time
+        watermark = sync_watermark(now)
+
+        since = None
+        token = request.query_params.get("since")
+        if token:
+            try:
+                since = decode_watermark(token)
+            except InvalidCursor:
+                return Response(
+                    {"success": False, "error": "Invalid watermark"},
+                    status=status.HTTP_400_BAD_REQUEST,
+                )
+            if since < now - TOMBSTONE_RETENTION:
+                since = None
+
+        invoices, hide_cancelled = invoice_scope(role, my_branch, timezone.localdate())
+
+        deleted = []
+        if since is not None:
+            invoices = invoices.filter(updated_at__gte=since - SYNC_OVERLAP)
+            tombstones = InvoiceTombstone.objects.filter(
+                deleted_at__gte=since - SYNC_OVERLAP
+            )
+            if role not in ["ADMIN", "SUPER_ADMIN"]:
+                tombstones = tombstones.filter(branch=my_branch)
+            deleted = list(tombstones.values_list("invoice_id", flat=True))
+
+        changed = list(invoice_read_queryset(invoices).order_by("updated_at", "id"))
+        if hide_cancelled:
+            deleted += [i.id for i in changed if i.payment_status == "CANCELLED"]
+            changed = [i for i in changed if i.payment_status != "CANCELLED"]
+
+        return Response(
+            {
+                "success": True,
+                "reset": since is None,
+                "watermark": encode_watermark(watermark),
+                "updated": InvoiceResponseSerializer(changed, many=True).data,
+                "deleted": deleted,
+            }
+        )
@@ -0,0 +1,72 @@
+from datetime import datetime, time
+
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from ..models import KitchenTicket
+from ..serializer_dir.kitchen_ticket_serializer import KitchenTicketSerializer
+
+
+class KitchenTicketViewClass(APIView):
+    """
+    Today's tickets for one kitchen of a branch, open (PENDING) ones by
+    default. Kitchen users always get their own kitchen type; managers and
+    admins pick one with ?kitchentype=<id>.
+    """
+
+    def get_user_role(self, user):
+        return "SUPER_ADMIN" if user.is_superuser else getattr(user, "user_type", "")
+
+    def get(self, request):
+        role = self.get_user_role(request.user)
+        my_branch = getattr(request.user, "branch", None)
+
+        if role == "KITCHEN":
+            kitchentype_id = request.user.kitchentype_id
+        elif role in ["SUPER_ADMIN", "ADMIN", "BRANCH_MANAGER", "COUNTER", "WAITER"]:
+            kitchentype_id = request.query_params.get("kitchentype")
+        else:
+            return Response(
+                {"success": False, "message": "Insufficient permissions"},
+                status=status.HTTP_403_FORBIDDEN,
+            )
+
+        if not kitchentype_id:
+            return Response(
+                {"success": False, "message": "kitchentype is required"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        if not str(kitchentype_id).isdigit():
+            return Response(
+                {"success": False, "message": "Invalid kitchentype"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        branch_id = my_branch.id if my_branch else request.query_params.get("branch")
+        if not branch_id:
+            return Response(
+                {"success": False, "message": "branch is required"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        if not str(branch_id).isdigit():
+            return Response(
+                {"success": False, "message": "Invalid branch"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        statuses = request.query_params.get("status", "PENDING").upper().split(",")
+        start_of_today = timezone.make_aware(
+            datetime.combine(timezone.localdate(), time.min)
+        )
+
+        tickets = KitchenTicket.objects.filter(
+            branch_id=branch_id,
+            kitchentype_id=kitchentype_id,
+            status__in=statuses,
+            created_at__gte=start_of_today,
+        ).order_by("created_at")
+
+        serializer = KitchenTicketSerializer(tickets, many=True)
+        return Response({"success": True, "data": serializer.data})
@@ -5,6 +5,7 @@ from rest_framework import status
 from rest_framework.response import Response
 from rest_framework.views import APIView
 
+from ..idempotency import idempotent
 from ..models import Invoice, Payment
 from ..serializer_dir.payment_serializer import PaymentSerializer
 
@@ -86,9 +87,9 @@ class PaymentClassView(APIView):
             payment_method = request.query_params.get("payment_method")
 
             if start_date:
-                filters["created_at__date__gte"] = start_date
+                filters["business_date__gte"] = start_date
             if end_date:
-                filters["created_at__date__lte"] = end_date
+                filters["business_date__lte"] = end_date
             if payment_method:
                 filters["payment_method"] = payment_method
 
@@ -102,6 +103,7 @@ class PaymentClassView(APIView):
             return Response({"success": True, "data": serializer.data})
 
     # ------------------ POST (Create Payment) ------------------
+    @idempotent
     @transaction.atomic
     def post(self, request, invoice_id):
         try:
@@ -1,16 +1,21 @@
 # backend/api/signals.py
 import logging
+from datetime import timedelta
 
 from django.db.models.signals import post_delete, post_save
 from django.dispatch import receiver
+from django.utils import timezone
 
-from ..models import Invoice, InvoiceItem, Payment, Product
+from ..analytics import bump_fact_months
+from ..dashboard_cache import bump_versions
+from ..events import publish_dashboard_changed
+from ..models import Invoice, InvoiceItem, InvoiceTombstone, Payment, Product
+from ..rollups import invoice_day, mark_rollups_dirty, rollups_refreshed
 
 logger = logging.getLogger(__name__)
 
-# Optional: You can import this if you set up Django Channels later
-# from .sse_views import trigger_dashboard_update
-
+# Clients whose delta sync watermark is older than this must resync fully
+TOMBSTONE_RETENTION = timedelta(days=7)
 
 @receiver(post_save, sender=Invoice)
 def invoice_saved(sender, instance, created, **kwargs):
@@ -19,8 +24,7 @@ def invoice_saved(sender, instance, created, **kwargs):
     logger.info(
         f"📝 Invoice {instance.invoice_number} {action} - branch: {instance.branch_id}"
     )
-    # Uncomment when you have Channels set up
-    # trigger_dashboard_update(branch_id=instance.branch_id)
+    mark_rollups_dirty([invoice_day(instance)])
 
 
 @receiver(post_delete, sender=Invoice)
@@ -29,7 +33,15 @@ def invoice_deleted(sender, instance, **kwargs):
     logger.info(
         f"🗑️ Invoice {instance.invoice_number} deleted - branch: {instance.branch_id}"
     )
-    # trigger_dashboard_update(branch_id=instance.branch_id)
+    mark_rollups_dirty([invoice_day(instance)])
+    # Leave a tombstone for GET /api/invoice/changes/ and prune expired ones
+    now = timezone.now()
+    InvoiceTombstone.objects.create(
+        invoice_id=instance.id, branch_id=instance.branch_id, deleted_at=now
+    )
+    InvoiceTombstone.objects.filter(
+        deleted_at__lt=now - TOMBSTONE_RETENTION
+    ).delete()
 
 
 @receiver(post_save, sender=Payment)
@@ -39,15 +51,39 @@ def payment_saved(sender, instance, created, **kwargs):
     logger.info(
         f"💰 Payment {instance.transaction_id} {action} - invoice: {instance.invoice.invoice_number}"
     )
-    # trigger_dashboard_update(branch_id=instance.invoice.branch_id)
+    mark_rollups_dirty([invoice_day(instance.invoice)])
+
+
+@receiver(post_delete, sender=Payment)
+def payment_deleted(sender, instance, **kwargs):
+    """Refresh the invoice's rollups when a payment is refunded"""
+    # Payments deleted along with their invoice are covered by invoice_deleted
+    invoice = (
+        Invoice.objects.filter(id=instance.invoice_id)
+        .only("branch_id", "business_date")
+        .first()
+    )
+    if invoice:
+        mark_rollups_dirty([invoice_day(invoice)])
 
 
 @receiver(post_save, sender=InvoiceItem)
 def invoice_item_saved(sender, instance, created, **kwargs):
     """Trigger dashboard update when items are added to invoice"""
+    mark_rollups_dirty([invoice_day(instance.invoice)])
     if created:
         logger.info(f"🛒 Item added to invoice {instance.invoice.invoice_number}")
-        # trigger_dashboard_update(branch_id=instance.invoice.branch_id)
+
+
+@receiver(rollups_refreshed)
+def sales_rollups_refreshed(sender, branch_ids, days=(), **kwargs):
+    """Invalidate cached dashboards once the rollups they read are current"""
+    # Bumping on the raw write itself would let a dashboard computed before
+    # the refresh be cached under the new version
+    bump_versions(branch_ids)
+    bump_fact_months(days)
+    # Wake the dashboard SSE streams of these branches
+    publish_dashboard_changed(branch_ids)
 
 
 @receiver(post_save, sender=Product)
@@ -56,4 +92,3 @@ def product_saved(sender, instance, **kwargs):
     logger.info(
         f"📦 Product {instance.name} stock updated to {instance.product_quantity}"
     )
-    # trigger_dashboard_update(branch_id=instance.branch_id)
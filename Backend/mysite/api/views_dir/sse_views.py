@@ -6,8 +6,6 @@ from datetime import date, datetime, timedelta
 from decimal import Decimal
 from json import JSONEncoder
 
-from asgiref.sync import sync_to_async
-
 from django.db.models import Count, F, Sum, ExpressionWrapper, Value, DecimalField, Q, Max
 from django.db.models.functions import (
     ExtractHour,
@@ -21,18 +19,28 @@ from django.http import StreamingHttpResponse
 from django.utils import timezone
 from django.views.decorators.csrf import csrf_exempt
 from django.views.decorators.http import require_GET
+from rest_framework import status
 from rest_framework.decorators import permission_classes
 from rest_framework.permissions import IsAuthenticated
+from rest_framework.response import Response
+from rest_framework.views import APIView
 
+from ..dashboard_broadcast import broadcaster_count, missed_events, subscribe, unsubscribe
+from ..db_pool import report_pool, report_sync_to_async
+from ..events import publish_dashboard_changed
 from ..models import Branch, Invoice, InvoiceItem, Payment, User
-from ..serializer_dir.invoice_serializer import InvoiceResponseSerializer
-from .dashboard_view import report_dashboard
+from .dashboard_view import dashboard_data, get_date_range, report_for_range
 
 logger = logging.getLogger(__name__)
 
 # Store active connections for broadcasting
 active_connections = set()
 
+# Seconds between heartbeats while no change arrives
+HEARTBEAT_INTERVAL = 15
+# Seconds after which a full snapshot is sent instead of the next patch
+RESYNC_INTERVAL = 60 * 5
+
 
 # Custom JSON encoder to handle Decimal and datetime objects
 class CustomJSONEncoder(JSONEncoder):
@@ -54,20 +62,20 @@ async def dashboard_sse(request):
     user = request.user
     
     # If not authenticated via session/cookies, check for token in query param
-    # Use sync_to_async for DB-related checks on user
-    is_auth = await sync_to_async(lambda: user.is_authenticated)()
+    # DB-related checks on user run on the report pool
+    is_auth = await report_sync_to_async(lambda: user.is_authenticated)()
     if not is_auth:
         token = request.GET.get("token")
         if token:
             from rest_framework_simplejwt.authentication import JWTAuthentication
             try:
                 auth = JWTAuthentication()
-                validated_token = await sync_to_async(auth.get_validated_token)(token)
-                user = await sync_to_async(auth.get_user)(validated_token)
+                validated_token = await report_sync_to_async(auth.get_validated_token)(token)
+                user = await report_sync_to_async(auth.get_user)(validated_token)
             except Exception:
                 pass
 
-    is_auth = await sync_to_async(lambda: user.is_authenticated)()
+    is_auth = await report_sync_to_async(lambda: user.is_authenticated)()
     if not is_auth:
         return StreamingHttpResponse(
             'event: error\ndata: {"message": "Unauthorized"}\n\n',
@@ -76,8 +84,8 @@ async def dashboard_sse(request):
         )
 
     branch_id = request.GET.get("branch_id")
-    # Check permissions - also needs sync_to_async for potential DB field access (superuser)
-    is_super = await sync_to_async(lambda: user.is_superuser)()
+    # Check permissions - also runs on the report pool for potential DB field access (superuser)
+    is_super = await report_sync_to_async(lambda: user.is_superuser)()
     role = "SUPER_ADMIN" if is_super else getattr(user, "user_type", "")
 
     if role not in ["SUPER_ADMIN", "ADMIN", "BRANCH_MANAGER"]:
@@ -87,6 +95,17 @@ async def dashboard_sse(request):
             status=403,
         )
 
+    target_branch = await report_sync_to_async(resolve_dashboard_branch)(user, branch_id, role)
+    start_date, end_date, timeframe = get_date_range(request)
+    # Streams of the same branch and period share one computation per change
+    key = (getattr(target_branch, "pk", None), timeframe, start_date, end_date)
+    # Clients opting in get JSON-patch deltas after the first snapshot
+    patches = request.GET.get("patches") in ["1", "true"]
+    # Id of the last event a reconnecting client got; EventSource sends the
+    # header itself, clients that reconnect by hand pass it as a parameter
+    last_event_id = request.headers.get("Last-Event-ID") or request.GET.get("last_event_id")
+    last_event_id = int(last_event_id) if last_event_id and last_event_id.isdigit() else None
+
     async def event_stream():
         # Generate unique connection ID
         connection_id = f"{user.id}_{timezone.now().timestamp()}"
@@ -96,52 +115,56 @@ async def dashboard_sse(request):
             f"SSE connection opened for user {user.username} (branch: {branch_id})"
         )
 
+        frames = subscribe(key, lambda: report_sync_to_async(dashboard_json_sync)(*key))
+        # Id of the last event the client has, and when the last snapshot was
+        last_id = last_event_id
+        last_snapshot = time.monotonic()
         try:
             # Send initial connection message
             yield f"event: connected\ndata: {json.dumps({'status': 'connected', 'user': user.username, 'branch_id': branch_id}, cls=CustomJSONEncoder)}\n\n"
 
-            # Set initial marker BEFORE sending initial data to avoid race condition
-            last_check = timezone.now() - timedelta(seconds=1)
-
-            # Send initial dashboard data
-            initial_data = await sync_to_async(get_dashboard_data_sync)(user, branch_id, role, request)
-            if initial_data:
-                yield f"event: dashboard_update\ndata: {json.dumps(initial_data, cls=CustomJSONEncoder)}\n\n"
-
-            heartbeat_count = 0
+            # Resume with the patches missed while disconnected, or fall
+            # back to the next snapshot when they are no longer logged
+            if patches and last_id is not None:
+                missed = await report_sync_to_async(missed_events)(key, last_id)
+                if missed is None:
+                    last_id = None
+                for last_id, patch in missed or []:
+                    yield patch
 
             while True:
-                # Use current time as prospective next marker
-                next_check = timezone.now()
-                
-                # Check for database changes
-                changed = await sync_to_async(has_dashboard_data_changed_sync)(branch_id, last_check)
-                if changed:
-                    logger.debug(
-                        f"Data changed for user {user.username}, sending update"
-                    )
-                    new_data = await sync_to_async(get_dashboard_data_sync)(user, branch_id, role, request)
-                    if new_data:
-                        yield f"event: dashboard_update\ndata: {json.dumps(new_data, cls=CustomJSONEncoder)}\n\n"
-                    
-                    # Update marker ONLY after successful processing
-                    last_check = next_check
-
-                # Send heartbeat every 15 seconds to keep connection alive
-                heartbeat_count += 1
-                if heartbeat_count >= 7:  # ~14 seconds with 2s sleep
+                # Sleep until a new frame; the heartbeat is the only timer
+                try:
+                    frame = await asyncio.wait_for(frames.get(), HEARTBEAT_INTERVAL)
+                except asyncio.TimeoutError:
+                    # Keep the connection alive through proxies
                     yield ": heartbeat\n\n"
-                    heartbeat_count = 0
-
-                await asyncio.sleep(2)
+                    continue
+
+                if frame.id == last_id:
+                    # Already sent, or the client had it before reconnecting
+                    continue
+                # A patch only applies on top of the version it was made from
+                if (
+                    patches
+                    and frame.patch is not None
+                    and frame.prev == last_id
+                    and time.monotonic() - last_snapshot < RESYNC_INTERVAL
+                ):
+                    yield frame.patch
+                else:
+                    yield frame.snapshot
+                    last_snapshot = time.monotonic()
+                last_id = frame.id
 
         except (asyncio.CancelledError, GeneratorExit):
             # Clean up on disconnect
-            active_connections.discard(connection_id)
             logger.info(f"SSE connection closed for user {user.username}")
         except Exception as e:
             logger.error(f"SSE error for user {user.username}: {e}")
+        finally:
             active_connections.discard(connection_id)
+            unsubscribe(key, frames)
 
     response = StreamingHttpResponse(event_stream(), content_type="text/event-stream")
     response["Cache-Control"] = "no-cache"
@@ -150,126 +173,36 @@ async def dashboard_sse(request):
     return response
 
 
-def has_dashboard_data_changed_sync(branch_id, since):
-    """
-    Quick check if any relevant data has changed using creation and update times
-    """
-    try:
-        # Standardize branch_id
-        if branch_id in ["null", "undefined", ""]:
-            branch_id = None
-
-        q_filter = Q(created_at__gt=since) | Q(updated_at__gt=since) if hasattr(Invoice, "updated_at") else Q(created_at__gt=since)
-        
-        if branch_id:
-            new_invoices = Invoice.objects.filter(branch_id=branch_id).filter(q_filter).exists()
-            new_payments = Payment.objects.filter(invoice__branch_id=branch_id, created_at__gt=since).exists()
-            new_items = InvoiceItem.objects.filter(invoice__branch_id=branch_id, created_at__gt=since).exists()
-        else:
-            new_invoices = Invoice.objects.filter(q_filter).exists()
-            new_payments = Payment.objects.filter(created_at__gt=since).exists()
-            new_items = InvoiceItem.objects.filter(created_at__gt=since).exists()
-
-        return new_invoices or new_payments or new_items
+def resolve_dashboard_branch(user, branch_id, role):
+    """Branch a dashboard stream shows, None for all branches."""
+    # Standardize branch_id
+    if branch_id in ["null", "undefined", ""]:
+        branch_id = None
 
-    except Exception as e:
-        logger.error(f"Error checking data changes: {e}")
-        return False
+    if branch_id:
+        try:
+            return Branch.objects.get(id=branch_id)
+        except (Branch.DoesNotExist, ValueError):
+            return None
+    elif role == "BRANCH_MANAGER":
+        return getattr(user, "branch", None)
+    return None
+
+
+def dashboard_json_sync(branch_id, timeframe, start_date, end_date):
+    """Dashboard of a branch and period as JSON, encoded once for all its streams."""
+    data = get_dashboard_data_sync(branch_id, timeframe, start_date, end_date)
+    return json.dumps(data, cls=CustomJSONEncoder)
 
 
-def get_dashboard_data_sync(user, branch_id, role, request):
+def get_dashboard_data_sync(target_branch, timeframe, start_date, end_date):
     """
     Get dashboard data using the shared report_dashboard logic to ensure consistency.
     """
     try:
-        # Standardize branch_id
-        if branch_id in ["null", "undefined", ""]:
-            branch_id = None
-
-        target_branch = None
-        if branch_id:
-            try:
-                target_branch = Branch.objects.get(id=branch_id)
-            except Branch.DoesNotExist:
-                pass
-        elif role == "BRANCH_MANAGER":
-            target_branch = getattr(user, "branch", None)
-
-        # Use the common report logic (which handles timeframe/dates from request)
-        report_data = report_dashboard(target_branch, request)
-        
-        start_date = report_data["start_date"]
-        end_date = report_data["end_date"]
-
-        # Replicate calculations from DashboardViewClass.get
-        base_filter = {"created_at__date__gte": start_date, "created_at__date__lte": end_date}
-        if target_branch:
-            base_filter["branch"] = target_branch
-
-        recent_orders_objs = (
-            Invoice.objects.filter(**base_filter)
-            .select_related("branch", "created_by")
-            .prefetch_related("bills", "bills__product", "payments")
-            .order_by("-created_at")[:5]
-        )
-        recent_orders = InvoiceResponseSerializer(recent_orders_objs, many=True).data
-
-        user_count = (
-            User.objects.filter(branch=target_branch).count() 
-            if target_branch else User.objects.all().count() - 1
-        )
-
-        response_data = {
-            **report_data,
-            "recent_orders": recent_orders,
-            "total_sum": report_data["total_month_sales"],
-            "total_sales": report_data["total_month_sales"],
-            "total_count_order": report_data["total_month_orders"],
-            "total_orders": report_data["total_month_orders"],
-            "average_order_value": report_data["avg_order"],
-            "avg_orders": report_data["avg_order"],
-            "total_sales_per_category": report_data["sales_by_category"],
-            "sales_percent": report_data["growth_percent"],
-            "order_percent": report_data["growth_percent"],
-            "avg_order_percent": report_data["growth_percent"],
-            "total_user": user_count,
-            "total_user_count": user_count,
-            "total_branch": Branch.objects.all().count(),
-            "total_count_branch": Branch.objects.all().count(),
-        }
-
-        if not target_branch:
-            # Global overview additions
-            response_data.update({
-                "top_perfomance_branch": list(Branch.objects.annotate(
-                    total_sales_per_branch=Coalesce(
-                        Sum("invoices__total_amount", filter=Q(invoices__created_at__date__gte=start_date, invoices__created_at__date__lte=end_date)),
-                        Value(0.0, output_field=DecimalField())
-                    )
-                ).values("name", "total_sales_per_branch").order_by("-total_sales_per_branch")[:5]),
-                "top_selling_items": report_data["top_selling_items_count"],
-            })
-        else:
-            # Branch specific additions
-            response_data.update({
-                "today_sales": report_data["total_month_sales"],
-                "top_selling_items": report_data["top_selling_items_count"],
-            })
-            
-            if (end_date - start_date).days == 0:
-                # Calculate peak hours for today
-                hourly_orders = (
-                    Invoice.objects.filter(**base_filter)
-                    .annotate(hour=TruncHour("created_at"))
-                    .values("hour")
-                    .annotate(total_orders=Count("id"))
-                )
-                max_orders = hourly_orders.aggregate(max_orders=Max("total_orders"))["max_orders"]
-                if max_orders is not None:
-                    peak_hours = hourly_orders.filter(total_orders=max_orders)
-                    response_data["peak_hours"] = [h["hour"].strftime("%I:%M %p") for h in peak_hours]
-
-        return response_data
+        # Use the common report logic
+        report_data = report_for_range(target_branch, start_date, end_date, timeframe)
+        return dashboard_data(target_branch, report_data)
 
     except Exception as e:
         logger.error(f"Error getting dashboard data: {e}")
@@ -282,6 +215,31 @@ def trigger_dashboard_update(branch_id=None):
     Manually trigger dashboard update for all connected clients
     """
     logger.info(f"Dashboard update triggered for branch: {branch_id}")
-    # In a more advanced implementation, you could use Django Channels
-    # to push updates to connected clients. For now, clients will poll.
+    publish_dashboard_changed([branch_id] if branch_id else [])
     return len(active_connections)
+
+
+class DashboardStreamStatsViewClass(APIView):
+    """
+    Load of this process's dashboard streams.
+    GET /api/dashboard/stream/stats/
+    report_pool shows whether report queries wait for a worker thread.
+    """
+
+    def get_user_role(self, user):
+        return "SUPER_ADMIN" if user.is_superuser else getattr(user, "user_type", "")
+
+    def get(self, request):
+        if self.get_user_role(request.user) not in ["ADMIN", "SUPER_ADMIN"]:
+            return Response(
+                {"success": False, "error": "Permission denied"},
+                status=status.HTTP_403_FORBIDDEN,
+            )
+        return Response(
+            {
+                "success": True,
+                "connections": len(active_connections),
+                "dashboards": broadcaster_count(),
+                "report_pool": report_pool.stats(),
+            }
+        )
@@ -1,4 +1,4 @@
-from django.db.models import Q, Sum
+from django.db.models import Count, F, Q, Sum
 from django.utils import timezone
 from rest_framework import status
 from rest_framework.response import Response
@@ -9,6 +9,73 @@ from ..models import Invoice, User
 from .dashboard_view import get_date_range
 
 
+# Each invoice counts once per staff member involved, under the first of
+# these columns naming them
+STAFF_COLUMNS = ["created_by", "received_by_waiter", "received_by_counter"]
+
+
+def staff_performance(branch, start_date, end_date):
+    """
+    Orders, sales and waiter cash in hand per active staff member of a
+    branch, over invoices whose business date is in the range.
+
+    Runs two queries whatever the number of staff: the staff list, and one
+    UNION ALL of an aggregate grouped by each of STAFF_COLUMNS. An invoice
+    is only counted under a column if the user did not already appear in
+    an earlier one, so the per-user sums never count an invoice twice.
+    """
+    staff_qs = User.objects.filter(
+        branch=branch,
+        is_active=True,
+    ).exclude(is_superuser=True)
+
+    invoices = Invoice.objects.filter(
+        branch=branch,
+        business_date__gte=start_date,
+        business_date__lte=end_date,
+    )
+    # Cash in hand represents waiter cash collections (partial payment status means waiter hasn't handed over yet)
+    cash_in_hand = Q(received_by_waiter__user_type="WAITER", payment_status="PARTIAL")
+
+    grouped = []
+    for index, column in enumerate(STAFF_COLUMNS):
+        by_column = invoices.filter(**{f"{column}__isnull": False})
+        for earlier in STAFF_COLUMNS[:index]:
+            by_column = by_column.exclude(**{column: F(earlier)})
+        grouped.append(
+            by_column.values(user_id=F(column))
+            .annotate(
+                orders=Count("id"),
+                sales=Sum("total_amount"),
+                cash=Sum("total_amount", filter=cash_in_hand),
+            )
+            .order_by()
+        )
+
+    totals = {}
+    for row in grouped[0].union(*grouped[1:], all=True):
+        total = totals.setdefault(row["user_id"], {"orders": 0, "sales": 0, "cash": 0})
+        total["orders"] += row["orders"]
+        total["sales"] += row["sales"] or 0
+        total["cash"] += row["cash"] or 0
+
+    staff_data = []
+    for staff in staff_qs:
+        total = totals.get(staff.id, {"orders": 0, "sales": 0, "cash": 0})
+        staff_data.append(
+            {
+                "id": staff.id,
+                "name": staff.full_name or staff.username,
+                "username": staff.username,
+                "role": staff.user_type,
+                "orders": total["orders"],
+                "sales": float(total["sales"]),
+                "cash_in_hand": float(total["cash"]),
+            }
+        )
+    return staff_data
+
+
 class StaffReportViewClass(APIView):
     """
     Returns staff performance data for a branch based on timeframe filter.
@@ -46,51 +113,7 @@ class StaffReportViewClass(APIView):
 
         start_date, end_date, timeframe = get_date_range(request)
 
-        # Fetch staff belonging to this branch (exclude super_admin, pure admins)
-        staff_qs = User.objects.filter(
-            branch=my_branch,
-            is_active=True,
-        ).exclude(is_superuser=True)
-
-        staff_data = []
-
-        for staff in staff_qs:
-            # Invoices where this staff member was involved, filtered by date
-            invoices_all = (
-                Invoice.objects.filter(
-                    branch=my_branch,
-                    created_at__date__gte=start_date,
-                    created_at__date__lte=end_date
-                )
-                .filter(
-                    Q(received_by_waiter=staff)
-                    | Q(received_by_counter=staff)
-                    | Q(created_by=staff)
-                )
-                .distinct()
-            )
-
-            total_orders = invoices_all.count()
-            total_sales = (
-                invoices_all.aggregate(total=Sum("total_amount"))["total"] or 0
-            )
-            # Cash in hand represents waiter cash collections (partial payment status means waiter hasn't handed over yet)
-            total_cash_in_hand = invoices_all.filter(
-                received_by_waiter__user_type="WAITER",
-                payment_status="PARTIAL"
-            ).aggregate(total_cash=Sum("total_amount"))["total_cash"] or 0
-
-            staff_data.append(
-                {
-                    "id": staff.id,
-                    "name": staff.full_name or staff.username,
-                    "username": staff.username,
-                    "role": staff.user_type,
-                    "orders": total_orders,
-                    "sales": float(total_sales),
-                    "cash_in_hand": float(total_cash_in_hand),
-                }
-            )
+        staff_data = staff_performance(my_branch, start_date, end_date)
 
         # Sort by orders descending
         staff_data.sort(key=lambda x: x["orders"], reverse=True)
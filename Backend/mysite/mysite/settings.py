@@ -248,6 +248,10 @@ elif DATABASE_URL:
     print(f"⚠️  Invalid DATABASE_URL scheme: {DATABASE_URL.split(':')[0]}://")
     print("⚠️  Falling back to local database configuration")
 
+# Threads (and so database connections) for SSE and dashboard report
+# queries, kept apart from the thread sync views run on
+REPORT_DB_WORKERS = int(os.getenv("REPORT_DB_WORKERS", "4"))
+
 # ==============================================================================
 # REST FRAMEWORK CONFIGURATION
 # ==============================================================================
@@ -345,6 +349,8 @@ MIDDLEWARE = [
     "django.contrib.auth.middleware.AuthenticationMiddleware",
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
+    "api.middleware.InvoiceEventsMiddleware",
+    "api.middleware.SalesRollupsMiddleware",
 ]
 
 ROOT_URLCONF = "mysite.urls"
@@ -23,6 +23,40 @@ type DashboardData = {
 
 type SSEHandler = (data: DashboardData) => void;
 
+// RFC 6902 operation as sent in dashboard_patch events
+type PatchOp = {
+  op: "add" | "remove" | "replace";
+  path: string;
+  value?: any;
+};
+
+// Apply add/remove/replace operations to a copy of a JSON document
+function applyPatch(document: any, ops: PatchOp[]) {
+  let result = structuredClone(document);
+  for (const { op, path, value } of ops) {
+    if (path === "") {
+      result = value;
+      continue;
+    }
+    const keys = path
+      .split("/")
+      .slice(1)
+      .map((key) => key.replace(/~1/g, "/").replace(/~0/g, "~"));
+    const last = keys.pop() as string;
+    const parent = keys.reduce((node, key) => node[key], result);
+    if (op === "remove") {
+      if (Array.isArray(parent)) {
+        parent.splice(Number(last), 1);
+      } else {
+        delete parent[last];
+      }
+    } else {
+      parent[last] = value;
+    }
+  }
+  return result;
+}
+
 export function useDashboardSSE(
   branchId: number | string | null | undefined,
   onUpdate: SSEHandler,
@@ -32,6 +66,10 @@ export function useDashboardSSE(
 ) {
   const eventSourceRef = useRef<EventSource | null>(null);
   const reconnectTimeoutRef = useRef<NodeJS.Timeout | null>(null);
+  // Last full dashboard, which dashboard_patch events apply to
+  const snapshotRef = useRef<DashboardData | null>(null);
+  // Id of the last dashboard event, to resume from after a reconnect
+  const lastEventIdRef = useRef<string | null>(null);
 
   const connect = useCallback(() => {
     // Close existing connection
@@ -53,6 +91,12 @@ export function useDashboardSSE(
     if (endDate) {
       queryParams.append("end_date", endDate);
     }
+    // Receive deltas after the first full snapshot
+    queryParams.append("patches", "1");
+    // Only what was missed is sent when resuming on top of our snapshot
+    if (snapshotRef.current && lastEventIdRef.current) {
+      queryParams.append("last_event_id", lastEventIdRef.current);
+    }
 
     const token = getAccessToken();
     if (token) {
@@ -76,12 +120,32 @@ export function useDashboardSSE(
       try {
         const data = JSON.parse(event.data);
         console.log("[SSE] Dashboard update received:", data);
+        snapshotRef.current = data;
+        lastEventIdRef.current = event.lastEventId;
         onUpdate(data);
       } catch (err) {
         console.error("[SSE] Failed to parse dashboard update:", err);
       }
     });
 
+    eventSource.addEventListener("dashboard_patch", (event) => {
+      try {
+        if (!snapshotRef.current) {
+          throw new Error("No snapshot to apply the patch to");
+        }
+        const data = applyPatch(snapshotRef.current, JSON.parse(event.data));
+        snapshotRef.current = data;
+        lastEventIdRef.current = event.lastEventId;
+        onUpdate(data);
+      } catch (err) {
+        console.error("[SSE] Failed to apply dashboard patch, resyncing:", err);
+        // Reconnect without a last event id so the server sends a fresh snapshot
+        snapshotRef.current = null;
+        lastEventIdRef.current = null;
+        connect();
+      }
+    });
+
     eventSource.onerror = async (error) => {
       console.error("[SSE] Error:", error);
       eventSource.close();
@@ -111,6 +175,9 @@ export function useDashboardSSE(
   }, [branchId, onUpdate, timeframe, startDate, endDate]);
 
   useEffect(() => {
+    // A different branch or period starts from a fresh snapshot
+    snapshotRef.current = null;
+    lastEventIdRef.current = null;
     connect();
 
     return () => {